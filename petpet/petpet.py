@@ -1,7 +1,7 @@
 import asyncio
 import functools
 from io import BytesIO
-from typing import Literal
+from typing import Literal, Union
 
 import discord
 from PIL import Image
@@ -35,28 +35,49 @@ class PetPet(commands.Cog):
     async def petpet(self, ctx, *, member: discord.Member = None):
         """PetPet someone."""
         member = member or ctx.author
+        # share PfpImgen's result cache when it's loaded
+        pfpimgen = self.bot.get_cog("PfpImgen")
+        cache = getattr(pfpimgen, "result_cache", None)
+        key = f"petpet:{member.avatar_url}"
         async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_petpet, ctx, avatar)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            for im in image:
-                await ctx.send(file=im)
-
-    async def get_avatar(self, member: discord.User):
+            image = cache.get(key) if cache else None
+            if image is None:
+                avatar = await self.get_avatar(ctx, member, 75)
+                if isinstance(avatar, str):
+                    return await ctx.send(avatar)
+                task = functools.partial(self.gen_petpet, ctx, avatar)
+                image = await self.generate_image(ctx, task)
+                if isinstance(image, str):
+                    return await ctx.send(image)
+                if cache:
+                    cache.put(key, image)
+        await ctx.send(file=discord.File(BytesIO(image), "petpet.gif"))
+
+    async def get_avatar(
+        self, ctx: commands.Context, member: discord.User, size: int
+    ) -> Union[Image.Image, str]:
+        # share PfpImgen's avatar cache when it's loaded
+        pfpimgen = self.bot.get_cog("PfpImgen")
+        if pfpimgen is not None and hasattr(pfpimgen, "avatar_cache"):
+            return await pfpimgen.get_avatar(member, size)
         avatar = BytesIO()
-        await member.avatar_url.save(avatar, seek_begin=True)
-        return avatar
+        await member.avatar_url_as(format="png", size=128).save(avatar, seek_begin=True)
+        # decoded like images are generated, so it's bounded the same way
+        return await self.generate_image(ctx, functools.partial(self.decode_avatar, avatar))
 
-    def bytes_to_image(self, avatar: BytesIO, size: int):
+    def decode_avatar(self, avatar: BytesIO) -> Image.Image:
         image = Image.open(avatar).convert("RGBA")
-        image = image.resize((size, size), Image.ANTIALIAS)
         avatar.close()
         return image
 
+    def resize_avatar(self, avatar: Image.Image, size: int) -> Image.Image:
+        return avatar.resize((size, size), Image.LANCZOS)
+
     async def generate_image(self, ctx: commands.Context, task: functools.partial):
+        # share PfpImgen's render pool when it's loaded
+        pfpimgen = self.bot.get_cog("PfpImgen")
+        if pfpimgen is not None and hasattr(pfpimgen, "render_pool"):
+            return await pfpimgen.generate_image(ctx, task)
         task = self.bot.loop.run_in_executor(None, task)
         try:
             image = await asyncio.wait_for(task, timeout=60)
@@ -65,8 +86,8 @@ class PetPet(commands.Cog):
         else:
             return image
 
-    def gen_petpet(self, ctx: commands.Context, member_avatar: BytesIO):
-        member_avatar = self.bytes_to_image(member_avatar, 75)
+    def gen_petpet(self, ctx: commands.Context, member_avatar: Image.Image) -> bytes:
+        member_avatar = self.resize_avatar(member_avatar, 75)
         # base canvas
         sprite = Image.open(f"{bundled_data_path(self)}/sprite.png", mode="r").convert("RGBA")
 
@@ -89,12 +110,9 @@ class PetPet(commands.Cog):
             loop=0,
             disposal=2,
         )
-        fp.seek(0)
         for im in images:
             im.close()
-        _file = discord.File(fp, "petpet.gif")
-        fp.close()
-        return [_file]
+        return fp.getvalue()
 
 
 """
@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+from PIL import Image, ImageFont
+
+# warn when decoding everything at load takes longer than this many seconds
+STARTUP_BUDGET = 1.0
+
+
+class AssetRegistry:
+    """Template images and fonts, decoded once and shared between renders.
+
+    Assets are loaded lazily on first use, or all at once with `preload`. Images are shared
+    between renders running in different threads, so they must be treated as read-only: paste
+    them onto other images, or `.copy()` them before drawing on them."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._images: Dict[str, Image.Image] = {}
+        self._fonts: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+
+    def image(self, name: str) -> Image.Image:
+        image = self._images.get(name)
+        if image is None:
+            with Image.open(self.path / name, mode="r") as fp:
+                image = fp.convert("RGBA")
+            # a concurrent first load may decode twice, but both results are identical
+            image = self._images.setdefault(name, image)
+        return image
+
+    def font(self, size: int, name: str = "arial.ttf") -> ImageFont.FreeTypeFont:
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = ImageFont.truetype(str(self.path / name), size)
+            font = self._fonts.setdefault(key, font)
+        return font
+
+    def preload(self, images: Iterable[str], fonts: Iterable[Tuple[str, int]]) -> Dict[str, float]:
+        """Decode the given images and (font file, size) pairs, returning how many seconds each
+        one took."""
+        timings = {}
+        for name in images:
+            start = time.perf_counter()
+            self.image(name)
+            timings[name] = time.perf_counter() - start
+        for name, size in fonts:
+            start = time.perf_counter()
+            self.font(size, name)
+            timings[f"{name}@{size}"] = time.perf_counter() - start
+        return timings
+
+    @property
+    def memory(self) -> int:
+        """Approximate number of bytes held by decoded images."""
+        return sum(
+            image.width * image.height * len(image.getbands()) for image in self._images.values()
+        )
+
+    def clear(self):
+        for image in self._images.values():
+            image.close()
+        self._images.clear()
+        self._fonts.clear()
@@ -0,0 +1,68 @@
+import functools
+from collections import OrderedDict
+from io import BytesIO
+from typing import Tuple
+
+import discord
+from PIL import Image
+
+from .render import RenderPool
+
+# sizes the Discord CDN will serve avatars at
+CDN_SIZES = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+def cdn_size(size: int) -> int:
+    """Get the smallest CDN size that is at least `size`."""
+    for cdn in CDN_SIZES:
+        if cdn >= size:
+            return cdn
+    return CDN_SIZES[-1]
+
+
+def decode_avatar(fp: BytesIO) -> Image.Image:
+    with Image.open(fp) as image:
+        avatar = image.convert("RGBA")
+    fp.close()
+    return avatar
+
+
+class AvatarCache:
+    """A bounded LRU cache of decoded avatars.
+
+    Entries are keyed by user ID, avatar hash and CDN size, so a changed avatar is never served
+    stale. Cached images are shared, so callers must copy them before drawing on them.
+
+    Avatars are decoded on the render pool, so decoding is bounded like rendering is and
+    `get` raises the same RenderPoolFull and asyncio.TimeoutError."""
+
+    def __init__(self, pool: RenderPool, *, max_entries: int = 128):
+        self.pool = pool
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[int, str, int], Image.Image]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def get(self, user: discord.User, size: int) -> Image.Image:
+        requested = cdn_size(size)
+        key = (user.id, user.avatar, requested)
+        avatar = self._cache.get(key)
+        if avatar is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return avatar
+
+        self.misses += 1
+        fp = BytesIO()
+        await user.avatar_url_as(format="png", size=requested).save(fp, seek_begin=True)
+        avatar = await self.pool.run(functools.partial(decode_avatar, fp))
+        self._cache[key] = avatar
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return avatar
+
+    def clear(self):
+        self._cache.clear()
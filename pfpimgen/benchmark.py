@@ -0,0 +1,152 @@
+"""Offline render benchmarks for the PfpImgen templates.
+
+Run from the repository root with the cog's requirements installed::
+
+    python -m pfpimgen.benchmark
+    python -m pfpimgen.benchmark --iterations 50 --only stoptalking banner
+    python -m pfpimgen.benchmark --encode
+
+Every template in templates.json is rendered with synthetic avatars, without a bot or network
+access, and the throughput and latency percentiles of each full render, including encoding,
+are reported. With --encode, each template is composited once and then encoded with every
+output option instead, reporting encode time against upload size; the template's configured
+option is marked with a *.
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from PIL import Image, ImageDraw
+
+from .assets import AssetRegistry
+from .encoding import OutputOptions, encode, is_opaque
+from .templates import Template, TemplateRenderer, load_templates
+
+CAPTION = "will you stop talking about the same thing over and over again"
+ENCODINGS = {
+    "png level 6": {"compress_level": 6},
+    "png level 1": {},
+    "png 256 colors": {"colors": 256},
+    "webp lossless": {"format": "WEBP"},
+    "webp q90": {"format": "WEBP", "quality": 90},
+    "jpeg q90": {"format": "JPEG", "quality": 90},
+}
+
+
+def make_avatar(size: int = 256, seed: int = 1) -> Image.Image:
+    avatar = Image.new("RGBA", (size, size), (seed * 40 % 255, 120, 200, 255))
+    draw = ImageDraw.Draw(avatar)
+    draw.rectangle((size // 10, size // 10, size // 2, size // 3), fill=(255, seed * 70 % 255, 0))
+    draw.ellipse((size // 3, size // 3, size - 10, size - 20), fill=(20, 20, 20))
+    return avatar
+
+
+def make_renderer() -> Tuple[TemplateRenderer, Dict[str, Template]]:
+    data = Path(__file__).parent / "data"
+    templates = load_templates(data / "templates.json")
+    assets = AssetRegistry(data)
+    assets.preload(
+        {image for template in templates.values() for image in template.images},
+        {font for template in templates.values() for font in template.fonts},
+    )
+    return TemplateRenderer(assets), templates
+
+
+def make_cases(
+    renderer: TemplateRenderer, templates: Dict[str, Template]
+) -> Dict[str, Callable[[], bytes]]:
+    cases = {}
+    for name, template in templates.items():
+        # bind the template now, the lambda would otherwise see the last one
+        def run(template=template):
+            avatars = {
+                source: make_avatar(256, seed)
+                for seed, source in enumerate(template.avatar_sizes, start=1)
+            }
+            return renderer.render(template, avatars, text=CAPTION, color=(52, 152, 219))
+
+        cases[name] = run
+    return cases
+
+
+def bench_encoding(
+    renderer: TemplateRenderer, templates: Dict[str, Template], names: List[str], iterations: int
+):
+    header = f"{'template':<16}{'encoding':<18}{'mean ms':>10}{'KiB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        template = templates[name]
+        avatars = {
+            source: make_avatar(256, seed)
+            for seed, source in enumerate(template.avatar_sizes, start=1)
+        }
+        im = renderer.compose(template, avatars, text=CAPTION, color=(52, 152, 219))
+        for encoding, data in ENCODINGS.items():
+            options = OutputOptions(data)
+            result = measure(lambda: encode(im, options), iterations)
+            size = len(encode(im, options)) / 1024
+            marker = "*" if repr(options) == repr(template.output) else ""
+            if options.format == "JPEG" and not is_opaque(im):
+                marker += " (png)"
+            print(f"{name:<16}{encoding + marker:<18}{result['mean']:>10.2f}{size:>10.1f}")
+        im.close()
+
+
+def percentile(latencies: List[float], percent: float) -> float:
+    index = min(int(len(latencies) * percent / 100), len(latencies) - 1)
+    return latencies[index]
+
+
+def measure(run: Callable[[], bytes], iterations: int) -> dict:
+    run()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run_start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - run_start) * 1000)
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "ops": iterations / total,
+        "mean": statistics.fmean(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "max": latencies[-1],
+    }
+
+
+def report(results: Dict[str, dict]):
+    header = (
+        f"{'template':<16}{'ops/s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for case, r in results.items():
+        print(
+            f"{case:<16}{r['ops']:>10.1f}{r['mean']:>10.2f}{r['p50']:>10.2f}{r['p95']:>10.2f}"
+            f"{r['max']:>10.2f}"
+        )
+
+
+def main():
+    renderer, templates = make_renderer()
+    parser = argparse.ArgumentParser(description="Benchmark the PfpImgen templates.")
+    parser.add_argument("--iterations", "-n", type=int, default=20)
+    parser.add_argument("--only", nargs="*", choices=sorted(templates), default=None)
+    parser.add_argument("--encode", action="store_true", help="compare output encodings")
+    args = parser.parse_args()
+    names = args.only or list(templates)
+    if args.encode:
+        bench_encoding(renderer, templates, names, args.iterations)
+        return
+    cases = make_cases(renderer, templates)
+    report({name: measure(cases[name], args.iterations) for name in names})
+
+
+if __name__ == "__main__":
+    main()
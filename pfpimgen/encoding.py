@@ -0,0 +1,73 @@
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+FORMATS = ("PNG", "WEBP", "JPEG")
+# magic numbers of the formats PfpImgen and PetPet output
+SIGNATURES = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8", "jpg"),
+    (b"GIF8", "gif"),
+    (b"RIFF", "webp"),
+)
+
+
+class OutputOptions(object):
+    """How a template's renders are encoded.
+
+    PNG is lossless and keeps transparency; `compress_level` trades encode time for size, and
+    `colors` quantizes to a palette for flat, cartoon-like templates. WEBP keeps transparency
+    and is lossless unless `quality` is set. JPEG is by far the fastest and smallest, but
+    renders that aren't fully opaque fall back to PNG so transparency is never lost."""
+
+    __slots__ = ("format", "compress_level", "colors", "quality")
+
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        self.format: str = data.get("format", "PNG").upper()
+        # zlib level 1 encodes about twice as fast as Pillow's default 6, for ~10% larger files
+        self.compress_level: int = data.get("compress_level", 1)
+        self.colors: Optional[int] = data.get("colors")
+        self.quality: Optional[int] = data.get("quality")
+        if self.format not in FORMATS:
+            raise ValueError(f"Unsupported output format `{self.format}`.")
+
+    def __repr__(self) -> str:
+        options = [self.format.lower()]
+        if self.format == "PNG":
+            options.append(f"level {self.compress_level}")
+            if self.colors:
+                options.append(f"{self.colors} colors")
+        if self.quality is not None:
+            options.append(f"quality {self.quality}")
+        return " ".join(options)
+
+
+def is_opaque(im: Image.Image) -> bool:
+    return im.mode != "RGBA" or im.getextrema()[3][0] == 255
+
+
+def encode(im: Image.Image, options: OutputOptions) -> bytes:
+    fp = BytesIO()
+    if options.format == "JPEG" and is_opaque(im):
+        im.convert("RGB").save(fp, "JPEG", quality=options.quality or 90)
+    elif options.format == "WEBP":
+        if options.quality is None:
+            im.save(fp, "WEBP", lossless=True, method=0)
+        else:
+            im.save(fp, "WEBP", quality=options.quality)
+    elif options.colors:
+        with im.quantize(options.colors, method=Image.FASTOCTREE) as palette:
+            palette.save(fp, "PNG", compress_level=options.compress_level)
+    else:
+        im.save(fp, "PNG", compress_level=options.compress_level)
+    return fp.getvalue()
+
+
+def extension(data: bytes) -> str:
+    """The file extension for encoded image `data`."""
+    for signature, ext in SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    return "png"
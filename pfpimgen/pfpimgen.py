@@ -1,19 +1,31 @@
 import asyncio
 import functools
+import logging
+import time
 from io import BytesIO
-from typing import Literal, Optional
+from typing import Literal, Optional, Union
 
 import discord
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image
 from redbot.core import checks, commands
 from redbot.core.bot import Red
 from redbot.core.config import Config
 from redbot.core.data_manager import bundled_data_path
-from redbot.core.utils.chat_formatting import pagify
 
 RequestType = Literal["discord_deleted_user", "owner", "user", "user_strict"]
 
+from .assets import STARTUP_BUDGET, AssetRegistry
+from .avatars import AvatarCache
 from .converters import FuzzyMember
+from .encoding import extension
+from .render import RenderPool, RenderPoolFull
+from .results import ResultCache, result_key
+from .templates import TemplateRenderer, load_templates
+
+log = logging.getLogger("red.phenom4n4n.pfpimgen")
+
+POOL_FULL = "Too many images are being generated right now. Try again in a bit."
+RENDER_FAILED = "An error occurred while generating this image. Try again later."
 
 
 class PfpImgen(commands.Cog):
@@ -28,9 +40,45 @@ class PfpImgen(commands.Cog):
             identifier=82345678897346,
             force_registration=True,
         )
+        default_global = {"render_workers": 2, "render_queue": 8}
+        self.config.register_global(**default_global)
+
+        self.render_pool = RenderPool()
+        self.avatar_cache = AvatarCache(self.render_pool)
+        self.assets = AssetRegistry(bundled_data_path(self))
+        self.templates = load_templates(bundled_data_path(self) / "templates.json")
+        self.renderer = TemplateRenderer(self.assets)
+        self.result_cache = ResultCache()
+        self.task = asyncio.create_task(self.initialize())
+
+    def cog_unload(self):
+        if self.task:
+            self.task.cancel()
+        self.render_pool.shutdown()
+
+    async def initialize(self):
+        data = await self.config.all()
+        self.render_pool.configure(workers=data["render_workers"], max_queue=data["render_queue"])
+
+        start = time.perf_counter()
+        images = {image for template in self.templates.values() for image in template.images}
+        fonts = {font for template in self.templates.values() for font in template.fonts}
+        timings = await self.bot.loop.run_in_executor(None, self.assets.preload, images, fonts)
+        total = time.perf_counter() - start
+        slowest = max(timings, key=timings.get)
+        report = (
+            f"Preloaded {len(timings)} assets ({self.assets.memory / 1048576:.1f} MiB) in "
+            f"{total * 1000:.1f} ms, slowest was {slowest} at {timings[slowest] * 1000:.1f} ms."
+        )
+        if total > STARTUP_BUDGET:
+            log.warning("%s This is over the %s s startup budget.", report, STARTUP_BUDGET)
+        else:
+            log.debug(report)
 
     async def red_delete_data_for_user(self, *, requester: RequestType, user_id: int) -> None:
-        return
+        # nothing is stored persistently, but cached avatars and renders may show the user
+        self.avatar_cache.clear()
+        self.result_cache.clear()
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -39,15 +87,7 @@ class PfpImgen(commands.Cog):
         """Make a neko avatar..."""
         if not member:
             member = ctx.author
-
-        async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_neko, ctx, avatar)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "neko", member)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -55,24 +95,12 @@ class PfpImgen(commands.Cog):
     async def bonk(self, ctx, *, member: FuzzyMember = None):
         """Bonk! Go to horny jail."""
         await ctx.trigger_typing()
-        bonker = False
+        bonker = None
         if member:
             bonker = ctx.author
         else:
             member = ctx.author
-
-        async with ctx.typing():
-            victim_avatar = await self.get_avatar(member)
-            if bonker:
-                bonker_avatar = await self.get_avatar(bonker)
-                task = functools.partial(self.gen_bonk, ctx, victim_avatar, bonker_avatar)
-            else:
-                task = functools.partial(self.gen_bonk, ctx, victim_avatar)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "bonk", member, author=bonker)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -81,14 +109,7 @@ class PfpImgen(commands.Cog):
         """You are now a simp."""
         if not member:
             member = ctx.author
-        async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_simp, ctx, avatar)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "simp", member)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -97,14 +118,7 @@ class PfpImgen(commands.Cog):
         """Banner"""
         if not member:
             member = ctx.author
-        async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_banner, ctx, avatar, member.color)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "banner", member)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -122,14 +136,7 @@ class PfpImgen(commands.Cog):
         text = " ".join(text.split())
         if not member:
             member = ctx.author
-        async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_nickel, ctx, avatar, text[:29])
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "nickel", member, text=text)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -145,14 +152,7 @@ class PfpImgen(commands.Cog):
         text = " ".join(text.split())
         if not member:
             member = ctx.author
-        async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_stop, ctx, avatar, text)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "stoptalking", member, text=text)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -160,14 +160,7 @@ class PfpImgen(commands.Cog):
     async def horny(self, ctx, *, member: FuzzyMember = None):
         """Assign someone a horny license."""
         member = member or ctx.author
-        async with ctx.typing():
-            avatar = await self.get_avatar(member)
-            task = functools.partial(self.gen_horny, avatar)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "horny", member)
 
     @checks.bot_has_permissions(attach_files=True)
     @commands.cooldown(1, 10, commands.BucketType.user)
@@ -186,294 +179,171 @@ class PfpImgen(commands.Cog):
             member = ctx.author
         else:
             biden = ctx.author
-        async with ctx.typing():
-            trump = await self.get_avatar(member)
-            if biden:
-                biden = await self.get_avatar(biden)
-            task = functools.partial(self.gen_shut, ctx, trump, text, biden_avatar=biden)
-            image = await self.generate_image(ctx, task)
-        if isinstance(image, str):
-            await ctx.send(image)
-        else:
-            await ctx.send(file=image)
+        await self.send_template(ctx, "shutup", member, author=biden, text=text)
 
-    async def generate_image(self, ctx: commands.Context, task: functools.partial):
-        task = self.bot.loop.run_in_executor(None, task)
-        try:
-            image = await asyncio.wait_for(task, timeout=60)
-        except asyncio.TimeoutError:
-            return "An error occurred while generating this image. Try again later."
+    @checks.bot_has_permissions(attach_files=True)
+    @commands.cooldown(1, 10, commands.BucketType.user)
+    @commands.command(cooldown_after_parsing=True)
+    async def imgen(
+        self,
+        ctx,
+        template: str,
+        member: Optional[FuzzyMember] = None,
+        *,
+        text: commands.clean_content(fix_channel_mentions=True) = None,
+    ):
+        """Make an image from any template.
+
+        Templates are defined in the cog's `templates.json`, so this also works for templates
+        that don't have their own command."""
+        template = template.lower()
+        if template not in self.templates:
+            available = ", ".join(f"`{name}`" for name in sorted(self.templates))
+            return await ctx.send(f"That template doesn't exist. Available templates: {available}")
+        if self.templates[template].has_text and not text:
+            return await ctx.send("That template needs some text.")
+        author = None
+        if member:
+            author = ctx.author
         else:
-            return image
-
-    async def get_avatar(self, member: discord.User):
-        avatar = BytesIO()
-        await member.avatar_url.save(avatar, seek_begin=True)
-        return avatar
-
-    def bytes_to_image(self, image: BytesIO, size: int):
-        image = Image.open(image).convert("RGBA")
-        image = image.resize((size, size), Image.ANTIALIAS)
-        return image
-
-    def gen_neko(self, ctx, member_avatar):
-        member_avatar = self.bytes_to_image(member_avatar, 156)
-        # base canvas
-        im = Image.new("RGBA", (500, 750), None)
-        # neko = Image.open(f"{bundled_data_path(self)}/neko/neko.png", mode="r").convert("RGBA")
-        nekomask = Image.open(f"{bundled_data_path(self)}/neko/nekomask.png", mode="r").convert(
-            "RGBA"
+            member = ctx.author
+        if text:
+            text = " ".join(text.split())
+        await self.send_template(ctx, template, member, author=author, text=text)
+
+    @commands.is_owner()
+    @commands.group()
+    async def pfpimgenset(self, ctx: commands.Context):
+        """Configure the PfpImgen render pool."""
+
+    @pfpimgenset.command(name="workers")
+    async def pfpimgenset_workers(self, ctx: commands.Context, workers: int):
+        """Set how many images can be rendered at the same time."""
+        if not 1 <= workers <= 16:
+            return await ctx.send("The worker count must be between 1 and 16.")
+        await self.config.render_workers.set(workers)
+        self.render_pool.configure(workers=workers)
+        await ctx.send(f"Images will now be rendered by {workers} workers.")
+
+    @pfpimgenset.command(name="queue")
+    async def pfpimgenset_queue(self, ctx: commands.Context, depth: int):
+        """Set how many images can wait for a free worker before new ones are rejected."""
+        if not 0 <= depth <= 100:
+            return await ctx.send("The queue depth must be between 0 and 100.")
+        await self.config.render_queue.set(depth)
+        self.render_pool.configure(max_queue=depth)
+        await ctx.send(f"Up to {depth} images can now wait for a worker.")
+
+    @pfpimgenset.command(name="stats")
+    async def pfpimgenset_stats(self, ctx: commands.Context):
+        """View render pool usage, latency and the image cache hit rate."""
+        pool = self.render_pool
+        waits = pool.queue_waits
+        renders = pool.render_times
+        description = (
+            f"Workers: {pool.workers}\n"
+            f"Queue Depth: {pool.max_queue}\n"
+            f"Running: {pool.running}\n"
+            f"Queued: {pool.queued}\n"
+            f"Completed: {pool.completed}\n"
+            f"Failed: {pool.failed}\n"
+            f"Rejected: {pool.rejected}\n"
+            f"Timed Out: {pool.timed_out}"
         )
-        # im.paste(neko, (0, 0), neko)
-
-        # pasting the pfp
-        im.paste(member_avatar, (149, 122), member_avatar)
-        im.paste(nekomask, (0, 0), nekomask)
-        nekomask.close()
-        member_avatar.close()
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "neko.png")
-        fp.close()
-        return _file
-
-    def gen_bonk(self, ctx, victim_avatar, bonker_avatar=None):
-        # base canvas
-        im = Image.open(f"{bundled_data_path(self)}/bonk/bonkbase.png", mode="r").convert("RGBA")
-
-        # pasting the victim
-        victim_avatar = self.bytes_to_image(victim_avatar, 256)
-        victim_avatar = victim_avatar.rotate(angle=10, resample=Image.BILINEAR)
-        im.paste(victim_avatar, (650, 225), victim_avatar)
-        victim_avatar.close()
-
-        # pasting the bonker
-        if bonker_avatar:
-            bonker_avatar = self.bytes_to_image(bonker_avatar, 223)
-            im.paste(bonker_avatar, (206, 69), bonker_avatar)
-            bonker_avatar.close()
-
-        # pasting the bat
-        bonkbat = Image.open(f"{bundled_data_path(self)}/bonk/bonkbat.png", mode="r").convert(
-            "RGBA"
+        e = discord.Embed(
+            color=await ctx.embed_color(), title="Render Pool", description=description
         )
-        im.paste(bonkbat, (452, 132), bonkbat)
-        bonkbat.close()
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "bonk.png")
-        fp.close()
-        return _file
-
-    def gen_simp(self, ctx, member_avatar):
-        member_avatar = self.bytes_to_image(member_avatar, 136)
-        # base canvas
-        im = Image.new("RGBA", (500, 319), None)
-        card = Image.open(f"{bundled_data_path(self)}/simp/simp.png", mode="r").convert("RGBA")
-
-        # pasting the pfp
-        member_avatar = member_avatar.rotate(angle=3, resample=Image.BILINEAR, expand=True)
-        im.paste(member_avatar, (73, 105))
-        member_avatar.close()
-
-        # pasting the card
-        im.paste(card, (0, 0), card)
-        card.close()
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "simp.png")
-        fp.close()
-        return _file
-
-    def gen_banner(self, ctx, member_avatar, color: discord.Color):
-        im = Image.new("RGBA", (489, 481), color.to_rgb())
-        comic = Image.open(f"{bundled_data_path(self)}/banner/banner.png", mode="r").convert(
-            "RGBA"
+        e.add_field(
+            name="Queue Wait",
+            value=(
+                f"p50: {pool.percentile(waits, 50) * 1000:.1f} ms\n"
+                f"p95: {pool.percentile(waits, 95) * 1000:.1f} ms"
+            ),
         )
-        member_avatar = self.bytes_to_image(member_avatar, 200)
-
-        # 2nd slide
-        av = member_avatar.rotate(angle=7, resample=Image.BILINEAR, expand=True)
-        av = av.resize((90, 90), Image.LANCZOS)
-        im.paste(av, (448, 38), av)
-
-        # 3rd slide
-        av2 = member_avatar.rotate(angle=7, resample=Image.BILINEAR, expand=True)
-        av2 = av2.resize((122, 124), Image.LANCZOS)
-        im.paste(av2, (47, 271), av2)
-
-        # 4th slide
-        av3 = member_avatar.rotate(angle=26, resample=Image.BILINEAR, expand=True)
-        av3 = av3.resize((147, 148), Image.LANCZOS)
-        im.paste(av2, (345, 233), av2)
-
-        av.close()
-        av2.close()
-        av3.close()
-        member_avatar.close()
-
-        # cover = Image.open(f"{bundled_data_path(self)}/banner/bannercover.png", mode="r").convert("RGBA")
-        # im.paste(cover, (240, 159), cover)
-        im.paste(comic, (0, 0), comic)
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "banner.png")
-        fp.close()
-        return _file
-
-    def gen_nickel(self, ctx, member_avatar, text: str):
-        member_avatar = self.bytes_to_image(member_avatar, 182)
-        # base canvas
-        im = Image.open(f"{bundled_data_path(self)}/nickel/nickel.png", mode="r").convert("RGBA")
-
-        # avatars
-        im.paste(member_avatar, (69, 70), member_avatar)
-        im.paste(member_avatar, (69, 407), member_avatar)
-        im.paste(member_avatar, (104, 758), member_avatar)
-        member_avatar.close()
-
-        # text
-        font = ImageFont.truetype(f"{bundled_data_path(self)}/arial.ttf", 30)
-        canvas = ImageDraw.Draw(im)
-        text_width, text_height = canvas.textsize(text, font, stroke_width=2)
-        canvas.text(
-            ((im.width - text_width) / 2, 285),
-            text,
-            font=font,
-            fill=(206, 194, 114),
-            align="center",
-            stroke_width=2,
-            stroke_fill=(0, 0, 0),
+        e.add_field(
+            name="Render Time",
+            value=(
+                f"p50: {pool.percentile(renders, 50) * 1000:.1f} ms\n"
+                f"p95: {pool.percentile(renders, 95) * 1000:.1f} ms"
+            ),
         )
+        cache = self.result_cache
+        e.add_field(
+            name="Result Cache",
+            value=(
+                f"Hit Rate: {cache.hit_rate:.1%}\n"
+                f"Hits: {cache.hits}\n"
+                f"Misses: {cache.misses}\n"
+                f"Images: {len(cache)}\n"
+                f"Memory: {cache.memory_bytes / 1048576:.1f}/{cache.max_bytes / 1048576:.0f} MiB"
+            ),
+            inline=False,
+        )
+        e.set_footer(text=f"Over the last {len(renders)} renders")
+        await ctx.send(embed=e)
+
+    @pfpimgenset.command(name="clearcache")
+    async def pfpimgenset_clearcache(self, ctx: commands.Context):
+        """Delete every cached image, so they're all rendered again."""
+        self.result_cache.clear()
+        await ctx.send("The image cache has been cleared.")
 
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "nickel.png")
-        fp.close()
-        return _file
-
-    def circle_avatar(self, avatar):
-        mask = Image.new("L", avatar.size, 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0) + avatar.size, fill=255)
-        avatar.putalpha(mask)
-        return avatar
-
-    def gen_stop(self, ctx, member_avatar, text: str):
-        member_avatar = self.bytes_to_image(member_avatar, 140)
-        # base canvas
-        im = Image.open(f"{bundled_data_path(self)}/stop/stop.png", mode="r").convert("RGBA")
-
-        # avatars
-        circle_main = self.circle_avatar(member_avatar).rotate(
-            angle=57, resample=Image.BILINEAR, expand=True
+    async def send_template(
+        self,
+        ctx: commands.Context,
+        name: str,
+        target: discord.User,
+        *,
+        author: Optional[discord.User] = None,
+        text: Optional[str] = None,
+    ):
+        template = self.templates[name]
+        members = {
+            source: member
+            for source, member in (("target", target), ("author", author))
+            if member and source in template.avatar_sizes
+        }
+        color = target.color.to_rgb() if template.background == "color" else None
+        key = result_key(
+            template.name,
+            template.digest,
+            *(f"{source}={member.avatar_url}" for source, member in members.items()),
+            color,
+            text,
         )
-        im.paste(circle_main, (84, 207), circle_main)
-        im.paste(circle_main, (42, 864), circle_main)
-        member_avatar.close()
-        circle_main.close()
-
-        # text
-        font = ImageFont.truetype(f"{bundled_data_path(self)}/arial.ttf", 25)
-        canvas = ImageDraw.Draw(im)
-        y = 70
-        pages = list(pagify(text, [" "], page_length=30))[:4]
-        for page in pages:
-            text_width, text_height = canvas.textsize(page, font, stroke_width=2)
-            x = ((im.width + 40) - text_width) / 2
-            canvas.text(
-                (x, y),
-                page,
-                font=font,
-                fill=(255, 255, 255),
-                align="center",
-                spacing=2,
-                stroke_width=2,
-                stroke_fill=(0, 0, 0),
-            )
-            y += 25
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "horny.png")
-        fp.close()
-        return _file
-
-    def gen_horny(self, member_avatar):
-        member_avatar = self.bytes_to_image(member_avatar, 85)
-        # base canvas
-        im = Image.new("RGBA", (360, 300), None)
-        card = Image.open(f"{bundled_data_path(self)}/horny/horny.png", mode="r").convert("RGBA")
-
-        # pasting the pfp
-        member_avatar = member_avatar.rotate(angle=22, resample=Image.BILINEAR, expand=True)
-        im.paste(member_avatar, (43, 117))
-        member_avatar.close()
-
-        # pasting the card
-        im.paste(card, (0, 0), card)
-        card.close()
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "horny.png")
-        fp.close()
-        return _file
-
-    def gen_shut(self, ctx, member_avatar, text: str, *, biden_avatar=None):
-        member_avatar = self.bytes_to_image(member_avatar, 135)
-        # base canvas
-        im = Image.open(f"{bundled_data_path(self)}/shutup/shutup.png", mode="r").convert("RGBA")
-
-        # avatars
-        im.paste(member_avatar, (49, 2), member_avatar)
-        member_avatar.close()
-        if biden_avatar:
-            biden_avatar = self.bytes_to_image(biden_avatar, 178)
-            im.paste(biden_avatar, (372, 0), biden_avatar)
-
-        # text
-        font = ImageFont.truetype(f"{bundled_data_path(self)}/arial.ttf", 20)
-        canvas = ImageDraw.Draw(im)
-        pages = list(pagify(text, [" "], page_length=40))[:2]
-        y = 250 - (len(pages) * 25)
-        for page in pages:
-            text_width, text_height = canvas.textsize(page, font, stroke_width=2)
-            x = ((im.width - 300) - text_width) / 2
-            canvas.text(
-                (x, y),
-                page,
-                font=font,
-                fill=(255, 255, 255),
-                align="center",
-                spacing=2,
-                stroke_width=2,
-                stroke_fill=(0, 0, 0),
-            )
-            y += 25
-
-        fp = BytesIO()
-        im.save(fp, "PNG")
-        fp.seek(0)
-        im.close()
-        _file = discord.File(fp, "shutup.png")
-        fp.close()
-        return _file
+        async with ctx.typing():
+            image = self.result_cache.get(key)
+            if image is None:
+                avatars = {}
+                for source, member in members.items():
+                    avatar = await self.get_avatar(member, template.avatar_sizes[source])
+                    if isinstance(avatar, str):
+                        return await ctx.send(avatar)
+                    avatars[source] = avatar
+                task = functools.partial(
+                    self.renderer.render, template, avatars, text=text, color=color
+                )
+                image = await self.generate_image(ctx, task)
+                if isinstance(image, str):
+                    return await ctx.send(image)
+                self.result_cache.put(key, image)
+        await ctx.send(file=discord.File(BytesIO(image), f"{template.name}.{extension(image)}"))
+
+    async def generate_image(self, ctx: commands.Context, task: functools.partial):
+        try:
+            image = await self.render_pool.run(task)
+        except RenderPoolFull:
+            return POOL_FULL
+        except asyncio.TimeoutError:
+            return RENDER_FAILED
+        else:
+            return image
+
+    async def get_avatar(self, member: discord.User, size: int) -> Union[Image.Image, str]:
+        """Get a decoded avatar, or an error message if the render pool couldn't decode it."""
+        try:
+            return await self.avatar_cache.get(member, size)
+        except RenderPoolFull:
+            return POOL_FULL
+        except asyncio.TimeoutError:
+            return RENDER_FAILED
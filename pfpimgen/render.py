@@ -0,0 +1,114 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Optional, TypeVar
+
+T = TypeVar("T")
+
+# how many recent jobs the latency percentiles are computed over
+SAMPLE_SIZE = 500
+
+
+class RenderPoolFull(Exception):
+    """Raised when a job is submitted while every worker is busy and the queue is full."""
+
+
+class RenderPool:
+    """A dedicated, bounded thread pool for image rendering.
+
+    Jobs beyond `workers` running and `max_queue` waiting are rejected immediately instead of
+    piling up, and the time each job spent waiting for a worker is tracked separately from the
+    time it spent rendering."""
+
+    def __init__(self, *, workers: int = 2, max_queue: int = 8, timeout: float = 60):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.executor = self._make_executor(workers)
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_waits: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+        self.render_times: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+
+    @staticmethod
+    def _make_executor(workers: int) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    @property
+    def queued(self) -> int:
+        return self.pending - self.running
+
+    def configure(self, *, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if workers is not None and workers != self.workers:
+            # jobs already submitted finish on the old executor
+            old = self.executor
+            self.executor = self._make_executor(workers)
+            self.workers = workers
+            old.shutdown(wait=False)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    async def run(self, task: Callable[[], T]) -> T:
+        """Run `task` in the pool.
+
+        Raises RenderPoolFull if the pool is saturated, or asyncio.TimeoutError if the job
+        doesn't finish within the timeout, counting the time spent queued."""
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise RenderPoolFull
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def timed() -> T:
+            started = time.perf_counter()
+            loop.call_soon_threadsafe(self._started, started - submitted)
+            try:
+                return task()
+            finally:
+                loop.call_soon_threadsafe(self._finished, time.perf_counter() - started)
+
+        self.pending += 1
+        future: Future = self.executor.submit(timed)
+        # the slot is only freed once the job actually stops, even if the caller gave up on it
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._released, f))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    def _started(self, waited: float):
+        self.running += 1
+        self.queue_waits.append(waited)
+
+    def _finished(self, elapsed: float):
+        self.running -= 1
+        self.render_times.append(elapsed)
+
+    def _released(self, future: Future):
+        self.pending -= 1
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    @staticmethod
+    def percentile(samples: Deque[float], percent: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
@@ -0,0 +1,64 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+# rendered images are at most a few MiB, so this holds a few dozen of them
+MEMORY_BYTES = 32 * 1024 * 1024
+
+
+def result_key(*parts) -> str:
+    """A cache key for a render's inputs."""
+    return "\x1f".join(map(str, parts))
+
+
+class ResultCache:
+    """An in-memory LRU cache of encoded images, bounded by bytes.
+
+    Renders are made from user avatars, so they're never written to disk; the cache is empty
+    again after a reload."""
+
+    def __init__(self, *, max_bytes: int = MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.memory_bytes = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @staticmethod
+    def digest(key: str) -> str:
+        # keys hold captions and avatar URLs, so only a fixed-size hash of them is kept
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        key = self.digest(key)
+        data = self._memory.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._memory.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        key = self.digest(key)
+        if key in self._memory:
+            self.memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def clear(self):
+        self._memory.clear()
+        self.memory_bytes = 0
@@ -0,0 +1,275 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from .assets import AssetRegistry
+from .encoding import OutputOptions, encode
+from .text import TextLayout
+from .transforms import circle, rotate
+
+Color = Tuple[int, int, int]
+Position = Tuple[int, int]
+
+
+class TemplateError(Exception):
+    """Raised when a template definition is invalid."""
+
+
+def _tuple(value) -> Optional[tuple]:
+    return tuple(value) if value is not None else None
+
+
+class AvatarLayer(object):
+    """An avatar resized to `size`, optionally cropped to a circle, rotated and scaled, then
+    pasted at every position."""
+
+    __slots__ = (
+        "source",
+        "size",
+        "circle",
+        "angle",
+        "expand",
+        "scale",
+        "mask",
+        "positions",
+        "optional",
+    )
+
+    def __init__(self, data: dict):
+        self.source: str = data["avatar"]
+        self.size: int = data["size"]
+        self.circle: bool = data.get("circle", False)
+        self.angle: float = data.get("angle", 0)
+        self.expand: bool = data.get("expand", False)
+        self.scale: Optional[Tuple[int, int]] = _tuple(data.get("scale"))
+        self.mask: bool = data.get("mask", True)
+        self.positions: List[Position] = [tuple(position) for position in data["positions"]]
+        self.optional: bool = data.get("optional", False)
+
+    @property
+    def transform(self) -> tuple:
+        """Layers with the same transform share one transformed avatar per render."""
+        return (self.source, self.size, self.circle, self.angle, self.expand, self.scale)
+
+
+class ImageLayer(object):
+    """A template asset pasted over everything below it."""
+
+    __slots__ = ("name", "position")
+
+    def __init__(self, data: dict):
+        self.name: str = data["image"]
+        self.position: Position = tuple(data.get("position", (0, 0)))
+
+
+class TextLayer(object):
+    """Caption text, centered horizontally and optionally wrapped to `max_width` pixels."""
+
+    __slots__ = (
+        "font_size",
+        "font",
+        "y",
+        "anchor",
+        "width_offset",
+        "max_width",
+        "max_lines",
+        "max_length",
+        "line_height",
+        "fill",
+        "stroke_width",
+        "stroke_fill",
+    )
+
+    def __init__(self, data: dict):
+        self.font_size: int = data["text"]
+        self.font: str = data.get("font", "arial.ttf")
+        self.y: int = data["y"]
+        self.anchor: str = data.get("anchor", "top")
+        self.width_offset: int = data.get("width_offset", 0)
+        self.max_width: Optional[int] = data.get("max_width")
+        self.max_lines: Optional[int] = data.get("max_lines")
+        self.max_length: Optional[int] = data.get("max_length")
+        self.line_height: int = data.get("line_height", self.font_size)
+        self.fill: Color = tuple(data.get("fill", (255, 255, 255)))
+        self.stroke_width: int = data.get("stroke_width", 2)
+        self.stroke_fill: Color = tuple(data.get("stroke_fill", (0, 0, 0)))
+        if self.anchor not in ("top", "bottom"):
+            raise TemplateError(f"Unknown text anchor `{self.anchor}`.")
+
+
+Layer = Union[AvatarLayer, ImageLayer, TextLayer]
+
+
+class Template(object):
+    """A meme template: a base canvas and the layers drawn onto it, bottom to top."""
+
+    __slots__ = (
+        "name",
+        "digest",
+        "base",
+        "size",
+        "background",
+        "output",
+        "layers",
+        "avatar_sizes",
+    )
+
+    def __init__(self, name: str, data: dict):
+        self.name = name
+        # changes whenever the definition does, so cached renders of an old version aren't reused
+        self.digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+        self.base: Optional[str] = data.get("base")
+        self.size: Optional[Tuple[int, int]] = _tuple(data.get("size"))
+        if (self.base is None) == (self.size is None):
+            raise TemplateError(f"Template `{name}` needs exactly one of `base` or `size`.")
+        self.background: Optional[str] = data.get("background")
+        try:
+            self.output = OutputOptions(data.get("output"))
+        except ValueError as error:
+            raise TemplateError(f"Template `{name}`: {error}")
+        self.layers: List[Layer] = []
+        for layer in data["layers"]:
+            if "avatar" in layer:
+                self.layers.append(AvatarLayer(layer))
+            elif "image" in layer:
+                self.layers.append(ImageLayer(layer))
+            elif "text" in layer:
+                self.layers.append(TextLayer(layer))
+            else:
+                raise TemplateError(f"Template `{name}` has a layer of unknown type.")
+
+        # the largest size each avatar source is drawn at, so it's fetched only once
+        self.avatar_sizes: Dict[str, int] = {}
+        for layer in self.layers:
+            if isinstance(layer, AvatarLayer):
+                current = self.avatar_sizes.get(layer.source, 0)
+                self.avatar_sizes[layer.source] = max(current, layer.size)
+
+    @property
+    def has_text(self) -> bool:
+        return any(isinstance(layer, TextLayer) for layer in self.layers)
+
+    @property
+    def images(self) -> List[str]:
+        images = [self.base] if self.base else []
+        images.extend(layer.name for layer in self.layers if isinstance(layer, ImageLayer))
+        return images
+
+    @property
+    def fonts(self) -> List[Tuple[str, int]]:
+        return [
+            (layer.font, layer.font_size) for layer in self.layers if isinstance(layer, TextLayer)
+        ]
+
+
+def load_templates(path: Path) -> Dict[str, Template]:
+    with open(path) as fp:
+        data = json.load(fp)
+    return {name: Template(name, template) for name, template in data.items()}
+
+
+class TemplateRenderer:
+    """Renders any template with the shared assets and cached transforms.
+
+    Each distinct avatar transform is computed once per render, however many layers or
+    positions use it."""
+
+    def __init__(self, assets: AssetRegistry):
+        self.assets = assets
+        self.text = TextLayout()
+
+    def render(
+        self,
+        template: Template,
+        avatars: Dict[str, Image.Image],
+        *,
+        text: Optional[str] = None,
+        color: Optional[Color] = None,
+    ) -> bytes:
+        """Render and encode `template`, returning the image file's contents."""
+        im = self.compose(template, avatars, text=text, color=color)
+        data = encode(im, template.output)
+        im.close()
+        return data
+
+    def compose(
+        self,
+        template: Template,
+        avatars: Dict[str, Image.Image],
+        *,
+        text: Optional[str] = None,
+        color: Optional[Color] = None,
+    ) -> Image.Image:
+        if template.base is not None:
+            im = self.assets.image(template.base).copy()
+        else:
+            background = color if template.background == "color" else None
+            im = Image.new("RGBA", template.size, background)
+
+        transformed: Dict[tuple, Image.Image] = {}
+        for layer in template.layers:
+            if isinstance(layer, AvatarLayer):
+                avatar = avatars.get(layer.source)
+                if avatar is None:
+                    if layer.optional:
+                        continue
+                    raise TemplateError(f"Template `{template.name}` needs a `{layer.source}`.")
+                key = layer.transform
+                if key not in transformed:
+                    # slots that only differ in their final scale share the rotation
+                    rotated = transformed.get(key[:-1])
+                    if rotated is None:
+                        rotated = transformed[key[:-1]] = self.transform_avatar(layer, avatar)
+                    if layer.scale:
+                        transformed[key] = rotated.resize(layer.scale, Image.LANCZOS)
+                    else:
+                        transformed[key] = rotated
+                avatar = transformed[key]
+                mask = avatar if layer.mask else None
+                for position in layer.positions:
+                    im.paste(avatar, position, mask)
+            elif isinstance(layer, ImageLayer):
+                image = self.assets.image(layer.name)
+                im.paste(image, layer.position, image)
+            elif text:
+                self.draw_text(im, layer, text)
+
+        for avatar in transformed.values():
+            avatar.close()
+        return im
+
+    def transform_avatar(self, layer: AvatarLayer, avatar: Image.Image) -> Image.Image:
+        avatar = avatar.resize((layer.size, layer.size), Image.LANCZOS)
+        if layer.circle:
+            avatar = circle(avatar)
+        if layer.angle:
+            avatar = rotate(avatar, layer.angle, expand=layer.expand)
+        return avatar
+
+    def draw_text(self, im: Image.Image, layer: TextLayer, text: str):
+        font = self.assets.font(layer.font_size, layer.font)
+        if layer.max_length is not None:
+            text = text[: layer.max_length]
+        if layer.max_width is None:
+            lines = [text]
+        else:
+            lines = self.text.wrap(font, text, layer.max_width, layer.max_lines)
+        y = layer.y
+        if layer.anchor == "bottom":
+            y -= len(lines) * layer.line_height
+        for line in lines:
+            text_width, text_height = self.text.size(font, line, layer.stroke_width)
+            x = ((im.width + layer.width_offset) - text_width) / 2
+            self.text.draw(
+                im,
+                (x, y),
+                line,
+                font,
+                fill=layer.fill,
+                stroke_width=layer.stroke_width,
+                stroke_fill=layer.stroke_fill,
+            )
+            y += layer.line_height
@@ -0,0 +1,196 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+from PIL import Image, ImageFont
+
+MEASURE_CACHE_SIZE = 4096
+SPRITE_CACHE_SIZE = 512
+
+
+class LRU:
+    """A small thread-safe LRU mapping, since renders run on several pool threads."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TextSprite(object):
+    """The stroke and fill coverage masks of a line, each with its offset from the draw
+    position."""
+
+    __slots__ = ("stroke", "stroke_offset", "fill", "fill_offset")
+
+    def __init__(
+        self,
+        stroke: Optional[Image.Image],
+        stroke_offset: Tuple[int, int],
+        fill: Image.Image,
+        fill_offset: Tuple[int, int],
+    ):
+        self.stroke = stroke
+        self.stroke_offset = stroke_offset
+        self.fill = fill
+        self.fill_offset = fill_offset
+
+
+def _mask(
+    font: ImageFont.FreeTypeFont, text: str, stroke_width: int, start: Tuple[float, float]
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    # the same call ImageDraw.text makes, wrapped into an Image so it can be pasted later.
+    # ImageDraw has no public way to draw only the stroke, so this needs getmask2's core image
+    # and Image._new, both of which still behave the same on Pillow 10 and 11
+    core, offset = font.getmask2(text, "L", stroke_width=stroke_width, start=start)
+    return Image.Image()._new(core), offset
+
+
+class TextLayout:
+    """Cached text measurement, line breaking and rasterization.
+
+    Word advances and line sizes are cached per font, lines are broken greedily on measured
+    widths, and each line's stroke and fill masks are rasterized once and then pasted in any
+    color, so a caption only costs anything the first time its text is seen. Fonts must be the
+    shared instances from the asset registry, since they're cached by identity."""
+
+    def __init__(self):
+        self.advances = LRU(MEASURE_CACHE_SIZE)
+        self.sizes = LRU(MEASURE_CACHE_SIZE)
+        self.sprites = LRU(SPRITE_CACHE_SIZE)
+
+    def advance(self, font: ImageFont.FreeTypeFont, text: str) -> float:
+        """The horizontal advance of `text`, used for line breaking."""
+        key = (font, text)
+        advance = self.advances.get(key)
+        if advance is None:
+            advance = font.getlength(text)
+            self.advances.put(key, advance)
+        return advance
+
+    def size(self, font: ImageFont.FreeTypeFont, text: str, stroke_width: int) -> Tuple[int, int]:
+        """The size of the drawn line, including its stroke, used for centering."""
+        key = (font, text, stroke_width)
+        size = self.sizes.get(key)
+        if size is None:
+            # what the deprecated getsize returned
+            left, top, right, bottom = font.getbbox(text, stroke_width=stroke_width)
+            size = (right - left, bottom + stroke_width)
+            self.sizes.put(key, size)
+        return size
+
+    def wrap(
+        self,
+        font: ImageFont.FreeTypeFont,
+        text: str,
+        max_width: float,
+        max_lines: Optional[int] = None,
+    ) -> List[str]:
+        """Break `text` into lines no wider than `max_width`, filling each line greedily.
+
+        Words wider than a whole line are split between characters."""
+        space = self.advance(font, " ")
+        lines = []
+        line = []
+        width = 0.0
+        for word in text.split():
+            if max_lines and len(lines) >= max_lines:
+                break
+            word_width = self.advance(font, word)
+            if word_width > max_width:
+                for chunk in self._split_word(font, word, max_width):
+                    if line:
+                        lines.append(" ".join(line))
+                    line, width = [chunk], self.advance(font, chunk)
+                continue
+            if line and width + space + word_width > max_width:
+                lines.append(" ".join(line))
+                line, width = [], 0.0
+            width += space + word_width if line else word_width
+            line.append(word)
+        if line:
+            lines.append(" ".join(line))
+        return lines[:max_lines] if max_lines else lines
+
+    def _split_word(self, font: ImageFont.FreeTypeFont, word: str, max_width: float) -> List[str]:
+        chunks = []
+        chunk = ""
+        width = 0.0
+        for char in word:
+            char_width = self.advance(font, char)
+            if chunk and width + char_width > max_width:
+                chunks.append(chunk)
+                chunk, width = "", 0.0
+            chunk += char
+            width += char_width
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def sprite(
+        self, font: ImageFont.FreeTypeFont, text: str, stroke_width: int, x: float, y: float
+    ) -> TextSprite:
+        # glyphs are rasterized at the draw position's subpixel offset, so that's part of the key
+        start = (math.modf(x)[0], math.modf(y)[0])
+        key = (font, text, stroke_width, start)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            stroke, stroke_offset = None, (0, 0)
+            if stroke_width:
+                stroke, stroke_offset = _mask(font, text, stroke_width, start)
+            fill, fill_offset = _mask(font, text, 0, start)
+            sprite = TextSprite(stroke, stroke_offset, fill, fill_offset)
+            self.sprites.put(key, sprite)
+        return sprite
+
+    def draw(
+        self,
+        im: Image.Image,
+        xy: Tuple[float, float],
+        text: str,
+        font: ImageFont.FreeTypeFont,
+        *,
+        fill: tuple,
+        stroke_width: int = 0,
+        stroke_fill: Optional[tuple] = None,
+    ):
+        """Draw a line exactly like `ImageDraw.text` would, from the cached masks."""
+        x, y = int(xy[0]), int(xy[1])
+        sprite = self.sprite(font, text, stroke_width, *xy)
+        if sprite.stroke is not None:
+            offset_x, offset_y = sprite.stroke_offset
+            im.paste(stroke_fill, (x + offset_x, y + offset_y), sprite.stroke)
+        offset_x, offset_y = sprite.fill_offset
+        im.paste(fill, (x + offset_x, y + offset_y), sprite.fill)
+
+    def clear(self):
+        self.advances.clear()
+        self.sizes.clear()
+        self.sprites.clear()
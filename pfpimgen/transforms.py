@@ -0,0 +1,60 @@
+import math
+from functools import lru_cache
+from typing import Tuple
+
+from PIL import Image, ImageDraw
+
+Size = Tuple[int, int]
+Matrix = Tuple[float, float, float, float, float, float]
+
+
+@lru_cache(maxsize=64)
+def circle_mask(size: Size) -> Image.Image:
+    """An ellipse mask filling `size`. The mask is shared, so it must not be drawn on."""
+    mask = Image.new("L", size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0) + size, fill=255)
+    return mask
+
+
+def circle(avatar: Image.Image) -> Image.Image:
+    """Crop `avatar` to a circle in place."""
+    avatar.putalpha(circle_mask(avatar.size))
+    return avatar
+
+
+@lru_cache(maxsize=64)
+def rotation(size: Size, angle: float, expand: bool) -> Tuple[Size, Matrix]:
+    """The output size and inverse affine matrix that `Image.rotate` would use.
+
+    Template slots rotate avatars of a fixed size by a fixed angle, so this is computed once per
+    slot rather than on every render."""
+    w, h = size
+    center_x, center_y = w / 2.0, h / 2.0
+    angle = -math.radians(angle)
+    a = round(math.cos(angle), 15)
+    b = round(math.sin(angle), 15)
+    d = round(-math.sin(angle), 15)
+    e = round(math.cos(angle), 15)
+    c = a * -center_x + b * -center_y + center_x
+    f = d * -center_x + e * -center_y + center_y
+    if expand:
+        xs = []
+        ys = []
+        for x, y in ((0, 0), (w, 0), (w, h), (0, h)):
+            xs.append(a * x + b * y + c)
+            ys.append(d * x + e * y + f)
+        new_w = math.ceil(max(xs)) - math.floor(min(xs))
+        new_h = math.ceil(max(ys)) - math.floor(min(ys))
+        shift_x, shift_y = -(new_w - w) / 2.0, -(new_h - h) / 2.0
+        c, f = a * shift_x + b * shift_y + c, d * shift_x + e * shift_y + f
+        w, h = new_w, new_h
+    return (w, h), (a, b, c, d, e, f)
+
+
+def rotate(
+    image: Image.Image, angle: float, *, expand: bool = False, resample=Image.BILINEAR
+) -> Image.Image:
+    """A drop-in for `image.rotate(angle, resample, expand)` using a cached matrix."""
+    size, matrix = rotation(image.size, angle, expand)
+    return image.transform(size, Image.AFFINE, matrix, resample)
@@ -2,8 +2,14 @@ import time
 
 import discord
 from redbot.core import checks, commands
+from redbot.core.utils.chat_formatting import box, pagify
+from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
 from TagScriptEngine import Interpreter, adapter, block
 
+from .evaluator import MathError, ParseError, evaluate
+
+MAX_BATCH_SIZE = 200
+
 
 class Calculator(commands.Cog):
     """
@@ -12,26 +18,51 @@ class Calculator(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        blocks = [
-            block.MathBlock(),
-            block.RandomBlock(),
-            block.RangeBlock(),
-        ]
-        self.engine = Interpreter(blocks)
+        self._engine = None
 
     async def red_delete_data_for_user(self, **kwargs):
         return
 
-    @commands.command(aliases=["calc"])
+    @property
+    def engine(self) -> Interpreter:
+        # only built when the Tags cog, which shares its engine, isn't loaded
+        if self._engine is None:
+            blocks = [
+                block.MathBlock(),
+                block.RandomBlock(),
+                block.RangeBlock(),
+            ]
+            self._engine = Interpreter(blocks)
+        return self._engine
+
+    async def process(self, tagscript: str) -> Interpreter.Response:
+        tags = self.bot.get_cog("Tags")
+        if tags is not None and hasattr(tags, "process_tagscript"):
+            return await tags.process_tagscript(tagscript)
+        return self.engine.process(tagscript)
+
+    async def calculate_query(self, query: str) -> str:
+        if "{" not in query:
+            try:
+                return str(evaluate(query))
+            except MathError as error:
+                return str(error)
+            except ParseError:
+                pass
+
+        output = await self.process("{m:" + query + "}")
+        if output.body is None:
+            budget = getattr(output, "budget", None)
+            return budget.exceeded if budget else "No output."
+        return output.body.replace("{m:", "").replace("}", "")
+
+    @commands.group(aliases=["calc"], invoke_without_command=True)
     async def calculate(self, ctx, *, query):
         """Math"""
         query = query.replace(",", "")
-        engine_input = "{m:" + query + "}"
         start = time.monotonic()
-        output = self.engine.process(engine_input)
+        output_string = await self.calculate_query(query)
         end = time.monotonic()
-
-        output_string = output.body.replace("{m:", "").replace("}", "")
         e = discord.Embed(
             color=await ctx.embed_color(),
             title=f"Input: `{query}`",
@@ -39,3 +70,41 @@ class Calculator(commands.Cog):
         )
         e.set_footer(text=f"Calculated in {round((end - start) * 1000, 3)} ms")
         await ctx.send(embed=e)
+
+    @calculate.command(name="batch")
+    async def calculate_batch(self, ctx, *, expressions: str = None):
+        """Calculate many expressions at once.
+
+        Put each expression on its own line, or attach a text file with one expression per line."""
+        if ctx.message.attachments:
+            content = await ctx.message.attachments[0].read()
+            try:
+                expressions = content.decode("utf-8")
+            except UnicodeDecodeError:
+                return await ctx.send("That file isn't valid text.")
+        if not expressions:
+            return await ctx.send_help()
+        queries = [line.replace(",", "").strip() for line in expressions.splitlines()]
+        queries = [query for query in queries if query]
+        if len(queries) > MAX_BATCH_SIZE:
+            return await ctx.send(f"You can only calculate {MAX_BATCH_SIZE} expressions at once.")
+
+        start = time.monotonic()
+        results = []
+        for index, query in enumerate(queries, start=1):
+            results.append(f"{index}. {query} = {await self.calculate_query(query)}")
+        end = time.monotonic()
+
+        color = await ctx.embed_color()
+        pages = list(pagify("\n".join(results), page_length=1900))
+        embeds = []
+        for index, page in enumerate(pages, start=1):
+            e = discord.Embed(color=color, title="Batch Calculation", description=box(page))
+            e.set_footer(
+                text=(
+                    f"{len(queries)} expressions calculated in "
+                    f"{round((end - start) * 1000, 3)} ms | {index}/{len(pages)}"
+                )
+            )
+            embeds.append(e)
+        await menu(ctx, embeds, DEFAULT_CONTROLS)
@@ -0,0 +1,189 @@
+import math
+import operator
+import re
+from functools import lru_cache
+
+MAX_LENGTH = 500
+MAX_DEPTH = 50
+MAX_EXPONENT = 1000
+
+TOKEN_RE = re.compile(
+    r"\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|(?P<name>[A-Za-z_][A-Za-z0-9_]*)"
+    r"|(?P<op>\*\*|[-+*/%^()]))"
+)
+
+FUNCTIONS = {
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "exp": math.exp,
+    "abs": abs,
+    "trunc": math.trunc,
+    "round": round,
+    "sgn": lambda x: (x > 0) - (x < 0),
+    "log": math.log10,
+    "ln": math.log,
+    "log2": math.log2,
+    "sqrt": math.sqrt,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+BINARY_OPERATORS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+}
+# binding power of each infix operator
+PRECEDENCE = {"+": 10, "-": 10, "*": 20, "/": 20, "%": 20, "^": 30, "**": 30}
+
+Node = tuple
+
+
+class ParseError(Exception):
+    """The query isn't plain arithmetic; the caller should fall back to TagScript."""
+
+
+class MathError(Exception):
+    """The query is arithmetic but can't be evaluated safely."""
+
+
+def tokenize(expression: str) -> list:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if not match:
+            raise ParseError(f"Unexpected character at {position}.")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name":
+            value = value.lower()
+            if value not in FUNCTIONS and value not in CONSTANTS:
+                raise ParseError(f"Unknown name `{value}`.")
+        tokens.append((kind, value))
+    return tokens
+
+
+class Parser:
+    """A small precedence-climbing parser that turns a token list into a tuple AST."""
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.index = 0
+        self.depth = 0
+
+    def peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else (None, None)
+
+    def advance(self):
+        token = self.peek()
+        self.index += 1
+        return token
+
+    def expect(self, value: str):
+        if self.advance()[1] != value:
+            raise ParseError(f"Expected `{value}`.")
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise ParseError("Empty expression.")
+        node = self.expression(0)
+        if self.index != len(self.tokens):
+            raise ParseError("Unexpected trailing input.")
+        return node
+
+    def expression(self, min_precedence: int) -> Node:
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise MathError("Expression is nested too deeply.")
+        left = self.unary()
+        while True:
+            kind, value = self.peek()
+            if kind != "op" or value not in PRECEDENCE:
+                break
+            precedence = PRECEDENCE[value]
+            if precedence < min_precedence:
+                break
+            self.advance()
+            if value in ("^", "**"):
+                # right associative
+                right = self.expression(precedence)
+                left = ("pow", left, right)
+            else:
+                right = self.expression(precedence + 1)
+                left = ("bin", value, left, right)
+        self.depth -= 1
+        return left
+
+    def unary(self) -> Node:
+        kind, value = self.peek()
+        if kind == "op" and value in ("-", "+"):
+            self.advance()
+            # like TagScript's math block, a sign belongs to the atom after it, so -2^2 is
+            # (-2)^2 = 4 and 2*-3^2 is 2*((-3)^2) = 18
+            operand = self.unary()
+            return ("neg", operand) if value == "-" else operand
+        return self.primary()
+
+    def primary(self) -> Node:
+        kind, value = self.advance()
+        if kind == "number":
+            return ("num", float(value))
+        if kind == "name":
+            if value in CONSTANTS:
+                return ("num", CONSTANTS[value])
+            self.expect("(")
+            argument = self.expression(0)
+            self.expect(")")
+            return ("call", value, argument)
+        if value == "(":
+            node = self.expression(0)
+            self.expect(")")
+            return node
+        raise ParseError("Unexpected token.")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> Node:
+    if len(expression) > MAX_LENGTH:
+        raise MathError(f"Expressions can be at most {MAX_LENGTH} characters long.")
+    return Parser(tokenize(expression)).parse()
+
+
+def evaluate_node(node: Node) -> float:
+    kind = node[0]
+    if kind == "num":
+        return node[1]
+    if kind == "neg":
+        return -evaluate_node(node[1])
+    if kind == "bin":
+        return BINARY_OPERATORS[node[1]](evaluate_node(node[2]), evaluate_node(node[3]))
+    if kind == "pow":
+        base = evaluate_node(node[1])
+        exponent = evaluate_node(node[2])
+        if abs(exponent) > MAX_EXPONENT:
+            raise MathError(f"Exponents are limited to {MAX_EXPONENT}.")
+        return math.pow(base, exponent)
+    # round, trunc and sgn return ints, which TagScript prints without a decimal point
+    return FUNCTIONS[node[1]](evaluate_node(node[2]))
+
+
+def evaluate(expression: str) -> float:
+    """Evaluate a plain arithmetic expression.
+
+    Results are floats, except for ints from round, trunc and sgn that no other operation
+    turned back into a float, exactly as TagScript's math block computes them.
+
+    Raises ParseError if the expression isn't plain arithmetic, or MathError if it can't be
+    evaluated, such as dividing by zero or a result that is too large."""
+    node = compile_expression(expression)
+    try:
+        return evaluate_node(node)
+    except ZeroDivisionError:
+        raise MathError("Division by zero.")
+    except (OverflowError, ValueError) as error:
+        raise MathError(f"Math error: {error}.")
@@ -1,72 +1,88 @@
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional
+
 from TagScriptEngine import Verb
 from TagScriptEngine.interface import Adapter
 from discord import Member, TextChannel, Guild
 
 
-class MemberAdapter(Adapter):
-    def __init__(self, member: Member):
-        self.member = member
-        self.attributes = {
-            "id": member.id,
-            "name": member.name,
-            "nick": member.display_name,
-            "avatar": member.avatar_url,
-            "discriminator": member.discriminator,
-            "created_at": member.created_at,
-            "joined_at": member.joined_at,
-            "mention": member.mention,
-            "bot": member.bot,
-        }
-
-    def get_value(self, ctx: Verb) -> str:
+class LazyAdapter(Adapter):
+    """An adapter that only computes an attribute the first time a tag asks for it."""
+
+    getters: Dict[str, Callable[[Any], Any]] = {}
+
+    def __init__(self, obj: Any):
+        self._object = obj
+        self._values = {}
+
+    def get_value(self, ctx: Verb) -> Optional[str]:
         if ctx.parameter == None:
-            return str(self.member)
-        param = self.attributes.get(ctx.parameter, None)
-        if param is not None:
-            return str(param)
-        else:
+            return str(self._object)
+        try:
+            return self._values[ctx.parameter]
+        except KeyError:
+            pass
+        getter = self.getters.get(ctx.parameter)
+        if getter is None:
             return None
+        param = getter(self._object)
+        value = str(param) if param is not None else None
+        self._values[ctx.parameter] = value
+        return value
+
+
+class MemberAdapter(LazyAdapter):
+    getters = {
+        "id": attrgetter("id"),
+        "name": attrgetter("name"),
+        "nick": attrgetter("display_name"),
+        "avatar": attrgetter("avatar_url"),
+        "discriminator": attrgetter("discriminator"),
+        "created_at": attrgetter("created_at"),
+        "joined_at": attrgetter("joined_at"),
+        "mention": attrgetter("mention"),
+        "bot": attrgetter("bot"),
+    }
+
+    def __init__(self, member: Member):
+        super().__init__(member)
 
+    @property
+    def member(self) -> Member:
+        return self._object
+
+
+class TextChannelAdapter(LazyAdapter):
+    getters = {
+        "id": attrgetter("id"),
+        "name": str,
+        "created_at": attrgetter("created_at"),
+        "nsfw": attrgetter("nsfw"),
+        "mention": attrgetter("mention"),
+        "topic": lambda channel: channel.topic or None,
+    }
 
-class TextChannelAdapter(Adapter):
     def __init__(self, channel: TextChannel):
-        self.channel = channel
-        self.attributes = {
-            "id": channel.id,
-            "name": str(channel),
-            "created_at": channel.created_at,
-            "nsfw": channel.nsfw,
-            "mention": channel.mention,
-            "topic": channel.topic or None,
-        }
-
-    def get_value(self, ctx: Verb) -> str:
-        if ctx.parameter == None:
-            return str(self.channel)
-        param = self.attributes.get(ctx.parameter, None)
-        if param is not None:
-            return str(param)
-        else:
-            return None
+        super().__init__(channel)
+
+    @property
+    def channel(self) -> TextChannel:
+        return self._object
 
 
-class GuildAdapter(Adapter):
+class GuildAdapter(LazyAdapter):
+    getters = {
+        "id": attrgetter("id"),
+        "name": str,
+        "icon": attrgetter("icon_url"),
+        "created_at": attrgetter("created_at"),
+        "member_count": attrgetter("_member_count"),
+        "description": lambda guild: guild.description or "No description.",
+    }
+
     def __init__(self, guild: Guild):
-        self.guild = guild
-        self.attributes = {
-            "id": guild.id,
-            "name": str(guild),
-            "icon": guild.icon_url,
-            "created_at": guild.created_at,
-            "member_count": guild._member_count,
-            "description": guild.description or "No description.",
-        }
-
-    def get_value(self, ctx: Verb) -> str:
-        if ctx.parameter == None:
-            return str(self.guild)
-        param = self.attributes.get(ctx.parameter, None)
-        if param is not None:
-            return str(param)
-        else:
-            return None
+        super().__init__(guild)
+
+    @property
+    def guild(self) -> Guild:
+        return self._object
@@ -0,0 +1,311 @@
+"""Offline TagScript benchmarks for the Tags engine.
+
+Run from the repository root with the cog's requirements installed::
+
+    python -m tags.benchmark
+    python -m tags.benchmark --iterations 5000 --only embed nested_if
+    python -m tags.benchmark --dispatch
+
+Every corpus entry is run through the same block configuration as the Tags cog, against fake
+members, channels and guilds, and the throughput, latency percentiles and allocations are
+reported for both uncached and compiled runs. With --dispatch, fake tag invocation messages
+are instead fed through the Tags cog's message dispatch, from the stored tag lookup to the
+reply, reporting messages per second.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List
+
+from TagScriptEngine import adapter
+
+from .adapters import GuildAdapter, MemberAdapter, TextChannelAdapter
+from .blocks import tag_blocks
+from .interpreter import CachedInterpreter, ExecutionBudget
+from .stats import UsageStats
+
+CORPUS: Dict[str, str] = {
+    "plain_text": "Welcome to the server! Please read the rules before chatting. " * 4,
+    "variables": (
+        "Hello {author(mention)}, welcome to {server}! You are member #{server(member_count)}. "
+        "Your account was created at {author(created_at)} and you joined at {author(joined_at)}. "
+        "This is {channel(mention)}: {channel(topic)}"
+    ),
+    "args": "{=(item):{args(1)}}{=(rest):{args}}You asked about {item}. Full query: {rest}",
+    "embed": (
+        '{embed({"title":"Rules","description":"Be nice to {author(name)}.",'
+        '"color":3447003,"fields":[{"name":"1","value":"No spam"},'
+        '{"name":"2","value":"No NSFW"}],"footer":{"text":"{server}"}})}'
+    ),
+    "require_blacklist": (
+        "{require(Moderator,Admin):You can't use this.}{blacklist(#general):Not here.}"
+        "{delete}{c:ping}Done, {author}."
+    ),
+    "nested_if": (
+        "{=(n):{args(1)}}"
+        "{if({n}==1):one|{if({n}==2):two|{if({n}==3):three|{if({n}==4):four|many}}}}"
+        " {any({n}==1|{n}==2):small|big} {all({n}!=0|{author(bot)}==False):ok|no}"
+    ),
+    "math_random": "{m:({args(1)}+4)*3/2} {random:a,b,c,d} {range:1-100} {5050:heads|tails}",
+}
+
+
+class FakeMember:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.display_name = name.title()
+        self.avatar_url = f"https://cdn.discordapp.com/avatars/{id}/hash.png"
+        self.discriminator = "0001"
+        self.created_at = datetime(2017, 1, 1)
+        self.joined_at = datetime(2020, 6, 1)
+        self.mention = f"<@{id}>"
+        self.bot = False
+
+    def __str__(self) -> str:
+        return f"{self.name}#{self.discriminator}"
+
+
+class FakeChannel:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.created_at = datetime(2018, 1, 1)
+        self.nsfw = False
+        self.mention = f"<#{id}>"
+        self.topic = "General chat."
+
+    async def send(self, content: str = None, **kwargs):
+        return None
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.icon_url = f"https://cdn.discordapp.com/icons/{id}/hash.png"
+        self.created_at = datetime(2016, 1, 1)
+        self._member_count = 12345
+        self.description = None
+
+    def get_member(self, id: int):
+        return AUTHOR if id == AUTHOR.id else None
+
+    def __str__(self) -> str:
+        return self.name
+
+
+AUTHOR = FakeMember(111111111111111111, "phen")
+CHANNEL = FakeChannel(222222222222222222, "general")
+GUILD = FakeGuild(333333333333333333, "Benchmark Server")
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.author = AUTHOR
+        self.channel = CHANNEL
+        self.guild = GUILD
+        self.mentions = []
+
+
+class FakeContext:
+    def __init__(self, message: FakeMessage, prefix: str):
+        self.message = message
+        self.prefix = prefix
+        self.author = message.author
+        self.channel = message.channel
+        self.guild = message.guild
+        self.me = AUTHOR
+        self.command = None
+        self.invoked_with = None
+        self.command_failed = False
+
+    async def send(self, content: str = None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeCommand:
+    qualified_name = "tag"
+
+    async def can_run(self, ctx: FakeContext) -> bool:
+        return True
+
+    async def call_before_hooks(self, ctx: FakeContext):
+        pass
+
+    async def call_after_hooks(self, ctx: FakeContext):
+        pass
+
+
+class FakeBot:
+    def __init__(self, loop: asyncio.AbstractEventLoop, prefix: str = "!"):
+        self.loop = loop
+        self.prefix = prefix
+        self.events = Counter()
+
+    async def message_eligible_as_command(self, message: FakeMessage) -> bool:
+        return True
+
+    async def get_context(self, message: FakeMessage) -> FakeContext:
+        prefix = self.prefix if message.content.startswith(self.prefix) else None
+        return FakeContext(message, prefix)
+
+    def dispatch(self, event: str, *args):
+        self.events[event] += 1
+
+
+def make_seed(args: str = "2 apples and oranges") -> dict:
+    author = MemberAdapter(AUTHOR)
+    channel = TextChannelAdapter(CHANNEL)
+    guild = GuildAdapter(GUILD)
+    return {
+        "args": adapter.StringAdapter(args),
+        "author": author,
+        "user": author,
+        "target": author,
+        "member": author,
+        "channel": channel,
+        "guild": guild,
+        "server": guild,
+    }
+
+
+def make_budget() -> ExecutionBudget:
+    return ExecutionBudget(max_steps=1000, max_chars=100000, timeout=2.0)
+
+
+def percentile(latencies: List[float], percent: float) -> float:
+    index = min(int(len(latencies) * percent / 100), len(latencies) - 1)
+    return latencies[index]
+
+
+def measure(run: Callable[[], object], iterations: int) -> dict:
+    for _ in range(min(iterations, 50)):
+        run()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run_start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - run_start) * 1000)
+    total = time.perf_counter() - start
+    latencies.sort()
+
+    sample = max(iterations // 10, 1)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(sample):
+        run()
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size for stat in snapshot.statistics("filename"))
+    return {
+        "ops": iterations / total,
+        "mean": statistics.fmean(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_kib": (peak - before) / 1024,
+        "retained_b": allocated / sample,
+    }
+
+
+def bench_corpus(names: List[str], iterations: int) -> Dict[str, dict]:
+    engine = CachedInterpreter(tag_blocks())
+    results = {}
+    for name in names:
+        tagscript = CORPUS[name]
+        results[f"{name} (uncached)"] = measure(
+            lambda: engine.process(tagscript, make_seed(), budget=make_budget()), iterations
+        )
+
+        def compiled_run():
+            compiled = engine.compile(GUILD.id, name, tagscript)
+            return engine.process(tagscript, make_seed(), compiled=compiled, budget=make_budget())
+
+        results[f"{name} (compiled)"] = measure(compiled_run, iterations)
+    results["seed adapters"] = measure(make_seed, iterations)
+    return results
+
+
+def make_cog(loop: asyncio.AbstractEventLoop, names: List[str]):
+    """A Tags cog with the corpus stored as tags, without Config or a running bot."""
+    from .tags import Tags
+
+    cog = Tags.__new__(Tags)
+    cog.bot = FakeBot(loop)
+    cog.tag = FakeCommand()
+    cog.engine = CachedInterpreter(tag_blocks())
+    cog.stats = UsageStats()
+    cog.pending_uses = defaultdict(Counter)
+    cog.tag_cache = {GUILD.id: set(names)}
+    cog.guild_data_cache = {
+        GUILD.id: {
+            "tags": {name: {"author": AUTHOR.id, "uses": 0, "tag": CORPUS[name]} for name in names}
+        }
+    }
+    return cog
+
+
+def bench_dispatch(names: List[str], iterations: int) -> Dict[str, dict]:
+    # requirement checks and tag commands need real role converters and a command tree
+    names = [name for name in names if name != "require_blacklist"]
+    loop = asyncio.new_event_loop()
+    cog = make_cog(loop, names)
+    results = {}
+    for name in names:
+        message = FakeMessage(f"!{name} 2 apples and oranges")
+        results[f"{name} (dispatch)"] = measure(
+            lambda: loop.run_until_complete(cog.dispatch_tag(message)), iterations
+        )
+    miss = FakeMessage("!not_a_tag 2 apples and oranges")
+    results["not a tag (dispatch)"] = measure(
+        lambda: loop.run_until_complete(cog.dispatch_tag(miss)), iterations
+    )
+    loop.close()
+    if cog.bot.events["command_error"]:
+        print(f"{cog.bot.events['command_error']} dispatches failed")
+    return results
+
+
+def report(results: Dict[str, dict]):
+    header = (
+        f"{'case':<32}{'ops/s':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'peak KiB':>10}{'B/run':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for case, r in results.items():
+        print(
+            f"{case:<32}{r['ops']:>12.0f}{r['mean']:>10.4f}{r['p50']:>10.4f}{r['p95']:>10.4f}"
+            f"{r['p99']:>10.4f}{r['peak_kib']:>10.1f}{r['retained_b']:>10.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Tags TagScript engine.")
+    parser.add_argument("--iterations", "-n", type=int, default=2000)
+    parser.add_argument("--only", nargs="*", choices=sorted(CORPUS), default=None)
+    parser.add_argument(
+        "--dispatch", action="store_true", help="feed tag messages through the cog's dispatch"
+    )
+    args = parser.parse_args()
+    names = args.only or list(CORPUS)
+    if args.dispatch:
+        report(bench_dispatch(names, args.iterations))
+    else:
+        report(bench_corpus(names, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from TagScriptEngine import block
+
 from .command import CommandBlock
 from .delete import DeleteBlock
 from .embed import EmbedBlock
@@ -5,6 +7,7 @@ from .silent import SilentBlock
 from .require_blacklist import RequireBlock, BlacklistBlock
 from .react import ReactBlock, ReactUBlock
 from .redirect import RedirectBlock
+from .sequential import SequentialBlock
 
 stable_blocks = [
     CommandBlock(),
@@ -16,4 +19,25 @@ stable_blocks = [
     ReactBlock(),
     RedirectBlock(),
     ReactUBlock(),
+    SequentialBlock(),
 ]
+
+
+def tag_blocks() -> list:
+    """The full block list the Tags engine is built with."""
+    return stable_blocks + [
+        block.MathBlock(),
+        block.RandomBlock(),
+        block.RangeBlock(),
+        block.AnyBlock(),
+        block.IfBlock(),
+        block.AllBlock(),
+        block.BreakBlock(),
+        block.StrfBlock(),
+        block.StopBlock(),
+        block.AssignmentBlock(),
+        block.FiftyFiftyBlock(),
+        block.ShortCutRedirectBlock("message"),
+        block.LooseVariableGetterBlock(),
+        block.SubstringBlock(),
+    ]
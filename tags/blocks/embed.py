@@ -1,10 +1,62 @@
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Union
 import json
 from TagScriptEngine import Interpreter, adapter
 from TagScriptEngine.block.helpers import helper_parse_if
 from TagScriptEngine.interface import Block
 from discord import Embed
 
+try:
+    import orjson
+except ImportError:
+    json_loads = json.loads
+else:
+    json_loads = orjson.loads
+
+
+@lru_cache(maxsize=256)
+def parse_embed(parameter: str) -> Union[Embed, str]:
+    """Parse embed JSON into an Embed template, or return the error message."""
+    if not parameter.startswith("{"):
+        parameter = "{" + parameter
+    if not parameter.endswith("}"):
+        parameter = parameter + "}"
+    try:
+        data = json_loads(parameter)
+    except json.decoder.JSONDecodeError as error:
+        return str(error)
+    if data.get("embed"):
+        data = data["embed"]
+    if data.get("timestamp"):
+        data["timestamp"] = data["timestamp"].strip("Z")
+    try:
+        e = Embed.from_dict(data)
+    except Exception as error:
+        return str(error)
+    length = len(e)
+    if length > 6000:
+        return f"`MAX EMBED LENGTH REACHED ({length}/6000)`"
+    return e
+
+
+def copy_embed(embed: Embed) -> Embed:
+    """Copy a cached embed template without `Embed.copy`'s to_dict/from_dict round-trip.
+
+    Only the field list and the footer, image, author etc. dicts can be changed in place, so
+    only those are copied; everything else is immutable and shared."""
+    copied = Embed.__new__(Embed)
+    for attr in Embed.__slots__:
+        try:
+            value = getattr(embed, attr)
+        except AttributeError:
+            continue
+        if isinstance(value, dict):
+            value = value.copy()
+        elif isinstance(value, list):
+            value = [field.copy() for field in value]
+        setattr(copied, attr, value)
+    return copied
+
 
 class EmbedBlock(Block):
     def will_accept(self, ctx: Interpreter.Context) -> bool:
@@ -14,24 +66,9 @@ class EmbedBlock(Block):
     def process(self, ctx: Interpreter.Context) -> Optional[str]:
         if "embed" in ctx.response.actions.keys() or ctx.verb.parameter is None:
             return None
-        if not ctx.verb.parameter.startswith("{"):
-            ctx.verb.parameter = "{" + ctx.verb.parameter
-        if not ctx.verb.parameter.endswith("}"):
-            ctx.verb.parameter = ctx.verb.parameter + "}"
-        try:
-            data = json.loads(ctx.verb.parameter)
-        except json.decoder.JSONDecodeError as error:
-            return str(error)
-        if data.get("embed"):
-            data = data["embed"]
-        if data.get("timestamp"):
-            data["timestamp"] = data["timestamp"].strip("Z")
-        try:
-            e = Embed.from_dict(data)
-        except Exception as error:
-            return str(error)
-        length = len(e)
-        if length > 6000:
-            return f"`MAX EMBED LENGTH REACHED ({length}/6000)`"
-        ctx.response.actions["embed"] = e
+        e = parse_embed(ctx.verb.parameter)
+        if isinstance(e, str):
+            return e
+        # the cached template is shared between runs, so hand out a copy
+        ctx.response.actions["embed"] = copy_embed(e)
         return ""
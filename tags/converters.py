@@ -13,6 +13,16 @@ class TagName(Converter):
         return "".join(argument.split())
 
 
+class TagSort(Converter):
+    SORTS = ("name", "uses", "author")
+
+    async def convert(self, ctx: commands.Context, argument: str) -> str:
+        argument = argument.lower()
+        if argument not in self.SORTS:
+            raise BadArgument(f"`{argument}` is not a valid sort. Use name, uses or author.")
+        return argument
+
+
 class TagConverter(Converter):
     async def convert(self, ctx: commands.Context, argument: str) -> Tag:
         cog = ctx.bot.get_cog("Tags")
@@ -0,0 +1,219 @@
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from TagScriptEngine import Interpreter, build_node_tree
+from TagScriptEngine.interface import Adapter, Block
+
+Coordinates = Tuple[Tuple[int, int], ...]
+
+EXPRESSION_CACHE_SIZE = 512
+
+# the budget of the run in progress; each thread and task sees its own
+current_budget: ContextVar[Optional["ExecutionBudget"]] = ContextVar(
+    "current_budget", default=None
+)
+
+
+class CompiledTag(object):
+    __slots__ = ("name", "content_hash", "coordinates", "hits")
+
+    def __init__(self, name: str, content_hash: int, coordinates: Coordinates):
+        self.name = name
+        self.content_hash = content_hash
+        self.coordinates = coordinates
+        self.hits = 0
+
+    def __repr__(self) -> str:
+        return f"<CompiledTag name={self.name!r} nodes={len(self.coordinates)} hits={self.hits}>"
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, budget: "ExecutionBudget", message: str):
+        self.budget = budget
+        super().__init__(message)
+
+
+class ExecutionBudget(object):
+    """Step, character and wall-clock limits for a single TagScript run."""
+
+    __slots__ = ("max_steps", "max_chars", "timeout", "steps", "chars", "start", "end", "exceeded")
+
+    def __init__(self, *, max_steps: int, max_chars: int, timeout: float):
+        self.max_steps = max_steps
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.steps = 0
+        self.chars = 0
+        self.start = None
+        self.end = None
+        self.exceeded = None
+
+    def __str__(self) -> str:
+        summary = (
+            f"{self.steps}/{self.max_steps} blocks, {self.chars}/{self.max_chars} chars, "
+            f"{round(self.elapsed * 1000, 3)}/{self.timeout * 1000:g} ms"
+        )
+        if self.exceeded:
+            summary = f"{summary}\n**Exceeded:** {self.exceeded}"
+        return summary
+
+    @property
+    def elapsed(self) -> float:
+        if self.start is None:
+            return 0.0
+        return (self.end or time.monotonic()) - self.start
+
+    def begin(self):
+        self.start = time.monotonic()
+
+    def finish(self):
+        self.end = time.monotonic()
+
+    def fail(self, message: str):
+        self.exceeded = message
+        self.finish()
+        raise BudgetExceeded(self, message)
+
+    def step(self):
+        self.steps += 1
+        if self.steps > self.max_steps:
+            self.fail(f"Block limit reached ({self.max_steps}).")
+        if time.monotonic() - self.start > self.timeout:
+            self.fail(f"Time limit reached ({self.timeout:g}s).")
+
+    def consume(self, output: str):
+        self.chars += len(output)
+        if self.chars > self.max_chars:
+            self.fail(f"Character limit reached ({self.max_chars}).")
+
+
+class BudgetedResponse(Interpreter.Response):
+    def __init__(self, budget: Optional[ExecutionBudget] = None):
+        super().__init__()
+        self.budget = budget
+
+
+class BudgetStep(Block):
+    """Charges a step for every node against the current run's budget.
+
+    It comes first in the block list, so it sees each node before any real block does, even
+    nodes that no block accepts. It never accepts a node itself."""
+
+    def will_accept(self, ctx: Interpreter.Context) -> bool:
+        budget = current_budget.get()
+        if budget is not None:
+            budget.step()
+        return False
+
+
+class BudgetedBlock(Block):
+    """Charges the output of a block against the current run's budget."""
+
+    def __init__(self, block: Block):
+        self.block = block
+
+    def __repr__(self) -> str:
+        return f"<BudgetedBlock block={self.block!r}>"
+
+    def will_accept(self, ctx: Interpreter.Context) -> bool:
+        return self.block.will_accept(ctx)
+
+    def process(self, ctx: Interpreter.Context) -> Optional[str]:
+        value = self.block.process(ctx)
+        if value is not None and (budget := current_budget.get()) is not None:
+            budget.consume(str(value))
+        return value
+
+
+class CachedInterpreter(Interpreter):
+    """An Interpreter that keeps the parsed node tree of stored tags.
+
+    Trees are cached per guild and keyed by tag name, then validated against a hash of
+    the tagscript so a stale entry is recompiled instead of being served. Unnamed
+    expressions from other cogs go through a separate bounded cache keyed by their text.
+    Runs can be
+    bounded by an `ExecutionBudget`, which is charged by the blocks it's built with.
+    Only TagScriptEngine's public `build_node_tree` and `Interpreter.solve` are used."""
+
+    def __init__(self, blocks: List[Block]):
+        super().__init__([BudgetStep()] + [BudgetedBlock(b) for b in blocks])
+        self.compiled: Dict[int, Dict[str, CompiledTag]] = {}
+        self.expressions: "OrderedDict[str, CompiledTag]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _compile(self, name: str, tagscript: str, content_hash: int) -> CompiledTag:
+        self.misses += 1
+        coordinates = tuple(node.coordinates for node in build_node_tree(tagscript))
+        return CompiledTag(name, content_hash, coordinates)
+
+    def compile(self, guild_id: int, name: str, tagscript: str) -> CompiledTag:
+        content_hash = hash(tagscript)
+        guild_cache = self.compiled.setdefault(guild_id, {})
+        compiled = guild_cache.get(name)
+        if compiled is not None and compiled.content_hash == content_hash:
+            self.hits += 1
+            compiled.hits += 1
+            return compiled
+        compiled = guild_cache[name] = self._compile(name, tagscript, content_hash)
+        return compiled
+
+    def compile_expression(self, tagscript: str) -> CompiledTag:
+        compiled = self.expressions.get(tagscript)
+        if compiled is not None:
+            self.expressions.move_to_end(tagscript)
+            self.hits += 1
+            compiled.hits += 1
+            return compiled
+        compiled = self.expressions[tagscript] = self._compile(
+            "expression", tagscript, hash(tagscript)
+        )
+        if len(self.expressions) > EXPRESSION_CACHE_SIZE:
+            self.expressions.popitem(last=False)
+        return compiled
+
+    def invalidate(self, guild_id: int, name: Optional[str] = None):
+        if name is None:
+            self.compiled.pop(guild_id, None)
+        elif guild_cache := self.compiled.get(guild_id):
+            guild_cache.pop(name, None)
+
+    def get_compiled(self, guild_id: int, name: str) -> Optional[CompiledTag]:
+        return self.compiled.get(guild_id, {}).get(name)
+
+    def process(
+        self,
+        message: str,
+        seed_variables: Dict[str, Adapter] = None,
+        charlimit: Optional[int] = None,
+        *,
+        compiled: CompiledTag = None,
+        budget: ExecutionBudget = None,
+    ) -> BudgetedResponse:
+        response = BudgetedResponse(budget)
+        if seed_variables is not None:
+            response.variables = {**response.variables, **seed_variables}
+        if compiled is None:
+            node_ordered_list = build_node_tree(message)
+        else:
+            # solve shifts the coordinates of the nodes it's given, so each run gets fresh ones
+            node_ordered_list: List[Interpreter.Node] = [
+                Interpreter.Node(coordinates) for coordinates in compiled.coordinates
+            ]
+        token = current_budget.set(budget)
+        if budget is not None:
+            budget.begin()
+        try:
+            output = self.solve(message, node_ordered_list, response, charlimit)
+        finally:
+            current_budget.reset(token)
+        if budget is not None:
+            budget.finish()
+        # a body set by a block wins over the output, as in Interpreter.process
+        if response.body is None:
+            response.body = output.strip("\n ")
+        else:
+            response.body = response.body.strip("\n ")
+        return response
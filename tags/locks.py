@@ -0,0 +1,34 @@
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator
+
+
+class KeyedSemaphores(object):
+    """Semaphores made on demand for each key, such as a guild or channel ID.
+
+    A key's semaphore only lives while something holds it or waits on it, so keys that are
+    seen once don't stay in memory."""
+
+    def __init__(self, value: int):
+        self.value = value
+        self.semaphores: Dict[Hashable, asyncio.Semaphore] = {}
+        self.users = Counter()
+
+    def __len__(self) -> int:
+        return len(self.semaphores)
+
+    @contextmanager
+    def use(self, key: Hashable) -> Iterator[asyncio.Semaphore]:
+        """The semaphore for `key`, kept until the block exits and then dropped if unused."""
+        semaphore = self.semaphores.get(key)
+        if semaphore is None:
+            semaphore = self.semaphores[key] = asyncio.Semaphore(self.value)
+        self.users[key] += 1
+        try:
+            yield semaphore
+        finally:
+            self.users[key] -= 1
+            if not self.users[key]:
+                del self.users[key]
+                del self.semaphores[key]
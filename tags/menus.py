@@ -0,0 +1,89 @@
+import contextlib
+import functools
+import math
+from typing import Callable, Dict, List
+
+import discord
+from redbot.core import commands
+from redbot.core.utils.menus import close_menu, menu
+
+TAGS_PER_PAGE = 20
+
+
+class TagListPages:
+    """Tag list pages that are only rendered when they're first shown.
+
+    Only the sorted tag names are held, so huge guilds never build the full listing. `menu` is
+    only ever given the page on screen, and the controls from `controls` turn the page index
+    kept here, so it never needs to see the other pages."""
+
+    def __init__(
+        self,
+        names: List[str],
+        tags: Dict[str, dict],
+        base_embed: discord.Embed,
+        *,
+        per_page: int = TAGS_PER_PAGE,
+    ):
+        self.names = names
+        self.tags = tags
+        self.base_embed = base_embed
+        self.per_page = per_page
+        self.pages: Dict[int, discord.Embed] = {}
+        self.index = 0
+
+    def __len__(self) -> int:
+        return max(math.ceil(len(self.names) / self.per_page), 1)
+
+    def __getitem__(self, index: int) -> discord.Embed:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = self.format_page(index)
+        return page
+
+    async def start(self, ctx: commands.Context, controls: Dict[str, Callable] = None):
+        """Open a menu on the first page, with page controls if there's more than one."""
+        self.index = 0
+        if controls is None:
+            controls = self.controls()
+        await menu(ctx, [self[0]], controls)
+
+    def controls(self) -> Dict[str, Callable]:
+        return {
+            "\N{LEFTWARDS BLACK ARROW}\N{VARIATION SELECTOR-16}": functools.partial(self.turn, -1),
+            "\N{CROSS MARK}": close_menu,
+            "\N{BLACK RIGHTWARDS ARROW}\N{VARIATION SELECTOR-16}": functools.partial(self.turn, 1),
+        }
+
+    async def turn(
+        self,
+        step: int,
+        ctx: commands.Context,
+        pages: list,
+        controls: Dict[str, Callable],
+        message: discord.Message,
+        page: int,
+        timeout: float,
+        emoji: str,
+    ):
+        perms = message.channel.permissions_for(ctx.me)
+        if perms.manage_messages:
+            with contextlib.suppress(discord.NotFound):
+                await message.remove_reaction(emoji, ctx.author)
+        self.index = (self.index + step) % len(self)
+        return await menu(ctx, [self[self.index]], controls, message=message, timeout=timeout)
+
+    def format_page(self, index: int) -> discord.Embed:
+        start = index * self.per_page
+        lines = []
+        for name in self.names[start : start + self.per_page]:
+            tag = self.tags.get(name, {})
+            lines.append(f"`{name}` - Created by <@!{tag.get('author')}>")
+        embed = self.base_embed.copy()
+        embed.description = "\n".join(lines)
+        embed.set_footer(text=f"{index + 1}/{len(self)} | {len(self.names)} tags")
+        return embed
@@ -0,0 +1,136 @@
+import math
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# latency histogram buckets grow by 25% each, starting at 0.1 ms
+LATENCY_BASE = 0.1
+LATENCY_GROWTH = 1.25
+LATENCY_BUCKETS = 64
+
+# how many of each guild's latest uses are kept as raw events
+RECENT_USES = 10
+
+
+class UsageEvent(object):
+    __slots__ = ("guild_id", "tag", "user_id", "timestamp", "latency", "total")
+
+    def __init__(
+        self,
+        guild_id: int,
+        tag: str,
+        user_id: int,
+        timestamp: float,
+        latency: float,
+        total: Optional[float] = None,
+    ):
+        self.guild_id = guild_id
+        self.tag = tag
+        self.user_id = user_id
+        self.timestamp = timestamp
+        self.latency = latency
+        self.total = total
+
+
+class GuildUsage(object):
+    """Rolling aggregates for a single guild.
+
+    Recording is O(1), and every query reads the aggregates rather than the raw events."""
+
+    __slots__ = ("uses", "hours", "started", "latencies", "totals", "total", "recent")
+
+    def __init__(self, hours: int, started: float):
+        self.uses = Counter()
+        self.hours: Deque[List[int]] = deque(maxlen=hours)
+        self.started = started
+        # the TagScript run alone, and the whole invocation including sends and actions
+        self.latencies = [0] * LATENCY_BUCKETS
+        self.totals = [0] * LATENCY_BUCKETS
+        self.total = 0
+        self.recent: Deque[UsageEvent] = deque(maxlen=RECENT_USES)
+
+    def record(self, event: UsageEvent):
+        self.recent.append(event)
+        self.uses[event.tag] += 1
+        self.total += 1
+        hour = int(event.timestamp // 3600)
+        if self.hours and self.hours[-1][0] == hour:
+            self.hours[-1][1] += 1
+        else:
+            self.hours.append([hour, 1])
+        total = event.latency if event.total is None else event.total
+        self.latencies[latency_bucket(event.latency)] += 1
+        self.totals[latency_bucket(total)] += 1
+
+    def hourly_rate(self, now: float) -> Tuple[int, float, int]:
+        """Returns the uses in the current hour, and the average per hour over the window.
+
+        The window is cut short to the hours since recording started, so the average isn't
+        diluted by hours before the cog was loaded. Its length is returned last."""
+        hour = int(now // 3600)
+        current = self.hours[-1][1] if self.hours and self.hours[-1][0] == hour else 0
+        covered = min(hour - int(self.started // 3600) + 1, self.hours.maxlen)
+        window = [count for bucket_hour, count in self.hours if hour - bucket_hour < covered]
+        return current, sum(window) / covered, covered
+
+    def percentile(self, percent: float, *, total: bool = False) -> Optional[float]:
+        """A latency percentile, of the TagScript runs or of whole invocations if `total`."""
+        if not self.total:
+            return None
+        threshold = self.total * percent / 100
+        seen = 0
+        for index, count in enumerate(self.totals if total else self.latencies):
+            seen += count
+            if seen >= threshold:
+                return latency_bound(index)
+        return latency_bound(LATENCY_BUCKETS - 1)
+
+
+def latency_bucket(latency: float) -> int:
+    if latency <= LATENCY_BASE:
+        return 0
+    index = math.ceil(math.log(latency / LATENCY_BASE, LATENCY_GROWTH))
+    return min(index, LATENCY_BUCKETS - 1)
+
+
+def latency_bound(index: int) -> float:
+    return LATENCY_BASE * LATENCY_GROWTH**index
+
+
+class UsageStats(object):
+    """An in-memory, append-only store of tag usage events.
+
+    Each guild keeps its latest events and rolling aggregates of all of them."""
+
+    def __init__(self, *, hours: int = 24):
+        self.guilds: Dict[int, GuildUsage] = {}
+        self.hours = hours
+        self.started = time.time()
+
+    def record(
+        self,
+        guild_id: int,
+        tag: str,
+        user_id: int,
+        latency: float,
+        total: Optional[float] = None,
+    ):
+        """Record a tag use.
+
+        `latency` is how long the TagScript took to run and `total` how long the whole
+        invocation took, both in milliseconds."""
+        event = UsageEvent(guild_id, tag, user_id, time.time(), latency, total)
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = GuildUsage(self.hours, self.started)
+        guild.record(event)
+
+    def get_guild(self, guild_id: int) -> Optional[GuildUsage]:
+        return self.guilds.get(guild_id)
+
+    def forget_tag(self, guild_id: int, tag: str):
+        if guild := self.guilds.get(guild_id):
+            guild.uses.pop(tag, None)
+            guild.recent = deque(
+                (event for event in guild.recent if event.tag != tag), maxlen=RECENT_USES
+            )
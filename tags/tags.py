@@ -1,11 +1,18 @@
 import asyncio
+import functools
+import json
+import re
 import time
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
-from typing import Literal, Optional, Tuple
+from io import BytesIO
+from typing import Dict, List, Literal, Optional, Tuple, Union
 from pathlib import Path
 
 import logging
 import discord
+from discord.ext.commands.view import StringView
 from discord.utils import escape_markdown
 from redbot.core import commands
 from redbot.core.bot import Red
@@ -13,18 +20,52 @@ from redbot.core.config import Config
 from redbot.core.utils.chat_formatting import box, humanize_list, pagify
 from redbot.core.utils.menus import DEFAULT_CONTROLS, close_menu, menu, start_adding_reactions
 from redbot.core.utils.predicates import ReactionPredicate
-from TagScriptEngine import Interpreter, adapter, block
+from TagScriptEngine import Interpreter, adapter
 
-from .blocks import stable_blocks
-from .converters import TagConverter, TagName
+from .blocks import tag_blocks
+from .converters import TagConverter, TagName, TagSort
 from .objects import Tag
 from .adapters import MemberAdapter, TextChannelAdapter, GuildAdapter
 from .ctx import SilentContext
+from .locks import KeyedSemaphores
+from .menus import TagListPages
+from .interpreter import BudgetedResponse, BudgetExceeded, CachedInterpreter, ExecutionBudget
+from .stats import UsageStats
 
 RequestType = Literal["discord_deleted_user", "owner", "user", "user_strict"]
 
 log = logging.getLogger("red.phenom4n4n.tags")
 
+EMOJI_RE = re.compile(r"<?a?:?[a-zA-Z0-9_]{2,32}:([0-9]{15,21})>?$")
+EMOJI_ID_RE = re.compile(r"[0-9]{15,21}$")
+EMOJI_NAME_RE = re.compile(r"[a-zA-Z0-9_]{2,32}$")
+# a guild's own emojis take up to three keys each, misses are only remembered below this
+EMOJI_CACHE_SIZE = 2048
+
+REQUIREMENT_RE = re.compile(r"{(?:require|whitelist|blacklist)\(([^(){}]+)\)", re.IGNORECASE)
+# items can come from tag input, so each guild only keeps its most recently used ones
+REQUIREMENT_CACHE_SIZE = 256
+
+USES_FLUSH_INTERVAL = 60
+
+TAG_MAX_STEPS = 1000
+TAG_MAX_CHARS = 100000
+TAG_TIMEOUT = 2.0
+# tags bigger than this are processed in a worker thread instead of on the event loop
+OFFLOAD_LENGTH = 2000
+OFFLOAD_NODES = 100
+
+# how many tag commands may be running at once across all guilds, and in each guild
+COMMAND_CONCURRENCY = 50
+GUILD_COMMAND_CONCURRENCY = 10
+# how long a tag command waits for both slots before it's dropped
+COMMAND_ACQUIRE_TIMEOUT = 10
+
+
+def is_count(value) -> bool:
+    """Whether `value` is a non-negative int, as tag uses and author IDs must be."""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
 
 async def delete_quietly(message: discord.Message):
     try:
@@ -47,7 +88,7 @@ class Tags(commands.Cog):
     The TagScript documentation can be found [here](https://github.com/phenom4n4n/phen-cogs/blob/master/tags/README.md).
     """
 
-    __version__ = "1.2.13"
+    __version__ = "1.2.28"
 
     def format_help_for_context(self, ctx):
         pre_processed = super().format_help_for_context(ctx)
@@ -64,35 +105,32 @@ class Tags(commands.Cog):
         default_guild = {"tags": {}}
         self.config.register_guild(**default_guild)
 
-        blocks = stable_blocks + [
-            block.MathBlock(),
-            block.RandomBlock(),
-            block.RangeBlock(),
-            block.AnyBlock(),
-            block.IfBlock(),
-            block.AllBlock(),
-            block.BreakBlock(),
-            block.StrfBlock(),
-            block.StopBlock(),
-            block.AssignmentBlock(),
-            block.FiftyFiftyBlock(),
-            block.ShortCutRedirectBlock("message"),
-            block.LooseVariableGetterBlock(),
-            block.SubstringBlock(),
-        ]
-        self.engine = Interpreter(blocks)
+        self.engine = CachedInterpreter(tag_blocks())
         self.role_converter = commands.RoleConverter()
         self.channel_converter = commands.TextChannelConverter()
         self.member_converter = commands.MemberConverter()
         self.emoji_converter = commands.EmojiConverter()
+        self.emoji_cache = {}
+        self.requirement_cache = {}
+        self.reaction_locks = KeyedSemaphores(1)
+        self.command_semaphore = asyncio.Semaphore(COMMAND_CONCURRENCY)
+        self.guild_command_semaphores = KeyedSemaphores(GUILD_COMMAND_CONCURRENCY)
 
         self.tag_cache = {}
         self.guild_data_cache = {}
+        self.pending_uses = defaultdict(Counter)
+        self.stats = UsageStats()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tags")
         self.task = asyncio.create_task(self.cache_tags())
+        self.uses_task = asyncio.create_task(self.uses_flush_loop())
 
     def cog_unload(self):
         if self.task:
             self.task.cancel()
+        if self.uses_task:
+            self.uses_task.cancel()
+        asyncio.create_task(self.flush_uses())
+        self.executor.shutdown(wait=False)
 
     async def red_delete_data_for_user(self, *, requester: str, user_id: int):
         if requester not in ("discord_deleted_user", "user"):
@@ -105,12 +143,63 @@ class Tags(commands.Cog):
                     if str(user_id) in str(tag["author"]):
                         async with self.config.guild(guild).tags() as t:
                             del t[name]
+                        self.uncache_tag(guild_id, name)
 
     async def cache_tags(self):
         guilds_data = await self.config.all_guilds()
         self.guild_data_cache = guilds_data
         for guild_id, data in guilds_data.items():
-            self.tag_cache[guild_id] = list(data.get("tags", {}).keys())
+            self.tag_cache[guild_id] = set(data.get("tags", {}).keys())
+
+    def cache_tag(self, guild_id: int, name: str, data: dict):
+        self.guild_data_cache.setdefault(guild_id, {}).setdefault("tags", {})[name] = data
+        self.tag_cache.setdefault(guild_id, set()).add(name)
+        self.engine.invalidate(guild_id, name)
+
+    def uncache_tag(self, guild_id: int, name: str):
+        self.guild_data_cache.get(guild_id, {}).get("tags", {}).pop(name, None)
+        self.tag_cache.get(guild_id, set()).discard(name)
+        self.engine.invalidate(guild_id, name)
+        self.pending_uses.get(guild_id, {}).pop(name, None)
+        self.stats.forget_tag(guild_id, name)
+
+    async def uses_flush_loop(self):
+        while True:
+            await asyncio.sleep(USES_FLUSH_INTERVAL)
+            try:
+                await self.flush_uses()
+            except Exception:
+                log.exception("Failed to flush tag uses.")
+
+    async def flush_uses(self):
+        """Write pending tag uses to Config, one write per guild.
+
+        A guild whose write fails keeps its counts pending for the next flush."""
+        pending, self.pending_uses = self.pending_uses, defaultdict(Counter)
+        for guild_id, counts in pending.items():
+            tags_value = self.config.guild_from_id(guild_id).tags
+            try:
+                # held like the `async with` writers hold it, so their changes aren't overwritten
+                async with tags_value.get_lock():
+                    # updated on a copy and written once, so a failure never leaves a partial write
+                    t = await tags_value()
+                    for name, count in counts.items():
+                        if name in t:
+                            t[name]["uses"] += count
+                    await tags_value.set(t)
+            except Exception:
+                log.exception("Failed to flush tag uses for guild %s.", guild_id)
+                # uses recorded during the failed write are already in the new counter
+                self.pending_uses[guild_id].update(counts)
+                continue
+            cached_tags = self.guild_data_cache.get(guild_id, {}).get("tags", {})
+            for name, count in counts.items():
+                if name in cached_tags:
+                    cached_tags[name]["uses"] = cached_tags[name].get("uses", 0) + count
+
+    def get_uses(self, guild_id: int, tag: Tag) -> int:
+        pending = self.pending_uses.get(guild_id, {}).get(str(tag), 0)
+        return (tag.uses or 0) + pending
 
     @commands.guild_only()
     @commands.group(invoke_without_command=True, usage="<tag_name> [args]", aliases=["customcom"])
@@ -126,11 +215,18 @@ class Tags(commands.Cog):
             if response:
                 await ctx.send(e)
             return
-        async with self.config.guild(ctx.guild).tags() as t:
-            t[tag_name]["uses"] += 1
+        await self.invoke_tag(ctx, _tag, args)
+
+    async def invoke_tag(self, ctx: commands.Context, tag: Tag, args: str = ""):
+        tag_name = str(tag)
+        self.pending_uses[ctx.guild.id][tag_name] += 1
         seed = {"args": adapter.StringAdapter(args)}
         log.info(f"Processing tag for {tag_name} on {ctx.guild} ({ctx.guild.id})")
-        await self.process_tag(ctx, _tag, seed_variables=seed)
+        compiled = self.engine.compile(ctx.guild.id, tag_name, tag.tagscript)
+        start = time.perf_counter()
+        latency = await self.process_tag(ctx, tag, seed_variables=seed, compiled=compiled)
+        total = (time.perf_counter() - start) * 1000
+        self.stats.record(ctx.guild.id, tag_name, ctx.author.id, latency, total)
 
     @commands.mod_or_permissions(manage_guild=True)
     @tag.command(aliases=["create", "+"])
@@ -150,7 +246,6 @@ class Tags(commands.Cog):
                 return
 
         await self.store_tag(ctx, tag_name, tagscript)
-        await self.cache_tags()
 
     @commands.mod_or_permissions(manage_guild=True)
     @tag.command(aliases=["e"])
@@ -158,6 +253,9 @@ class Tags(commands.Cog):
         """Edit a tag with TagScript."""
         async with self.config.guild(ctx.guild).tags() as t:
             t[str(tag)]["tag"] = tagscript
+            data = t[str(tag)].copy()
+        self.cache_tag(ctx.guild.id, str(tag), data)
+        await self.cache_requirements(ctx, tagscript)
         await ctx.send(f"Tag `{tag}` edited.")
 
     @commands.mod_or_permissions(manage_guild=True)
@@ -166,8 +264,84 @@ class Tags(commands.Cog):
         """Delete a tag."""
         async with self.config.guild(ctx.guild).tags() as e:
             del e[str(tag)]
+        self.uncache_tag(ctx.guild.id, str(tag))
         await ctx.send("Tag deleted.")
-        await self.cache_tags()
+
+    @commands.bot_has_permissions(attach_files=True)
+    @commands.mod_or_permissions(manage_guild=True)
+    @tag.command(name="export")
+    async def tag_export(self, ctx):
+        """Export this server's tags as a JSON-lines file."""
+        tags = self.guild_data_cache.get(ctx.guild.id, {}).get("tags", {})
+        if not tags:
+            return await ctx.send("There are no stored tags on this server.")
+        pending = self.pending_uses.get(ctx.guild.id, {})
+        fp = BytesIO()
+        for name, data in tags.items():
+            entry = {
+                "name": name,
+                "tag": data["tag"],
+                "author": data.get("author"),
+                "uses": (data.get("uses") or 0) + pending.get(name, 0),
+            }
+            fp.write(json.dumps(entry).encode("utf-8"))
+            fp.write(b"\n")
+        fp.seek(0)
+        await ctx.send(
+            f"Exported {len(tags)} tags.",
+            file=discord.File(fp, f"tags-{ctx.guild.id}.jsonl"),
+        )
+
+    @commands.mod_or_permissions(manage_guild=True)
+    @tag.command(name="import")
+    async def tag_import(self, ctx, overwrite: bool = False):
+        """Import tags from a JSON-lines file made by `[p]tag export`.
+
+        Existing tags are skipped unless `overwrite` is true."""
+        if not ctx.message.attachments:
+            return await ctx.send("You need to attach a file made by the export command.")
+        fp = BytesIO()
+        await ctx.message.attachments[0].save(fp, seek_begin=True)
+
+        existing = self.guild_data_cache.get(ctx.guild.id, {}).get("tags", {})
+        new_tags = {}
+        skipped = 0
+        for line_number, line in enumerate(fp, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                name = "".join(str(entry["name"]).split())
+                tagscript = entry["tag"]
+            except (ValueError, KeyError, TypeError):
+                fp.close()
+                return await ctx.send(f"Line {line_number} isn't a valid tag entry.")
+            author = entry.get("author") or ctx.author.id
+            uses = entry.get("uses") or 0
+            if (
+                not name
+                or not isinstance(tagscript, str)
+                or not is_count(author)
+                or not is_count(uses)
+                or self.bot.get_command(name)
+                or (name in existing and not overwrite)
+            ):
+                skipped += 1
+                continue
+            new_tags[name] = {"author": author, "uses": uses, "tag": tagscript}
+        fp.close()
+        if not new_tags:
+            return await ctx.send(f"No tags were imported. ({skipped} skipped)")
+
+        async with self.config.guild(ctx.guild).tags() as t:
+            t.update(new_tags)
+        for name in new_tags:
+            self.pending_uses.get(ctx.guild.id, {}).pop(name, None)
+            self.stats.forget_tag(ctx.guild.id, name)
+            self.engine.invalidate(ctx.guild.id, name)
+        self.guild_data_cache.setdefault(ctx.guild.id, {}).setdefault("tags", {}).update(new_tags)
+        self.tag_cache.setdefault(ctx.guild.id, set()).update(new_tags)
+        await ctx.send(f"Imported {len(new_tags)} tags. ({skipped} skipped)")
 
     @tag.command(name="info")
     async def tag_info(self, ctx, tag: TagConverter):
@@ -175,10 +349,59 @@ class Tags(commands.Cog):
         e = discord.Embed(
             color=await ctx.embed_color(),
             title=f"`{tag}` Info",
-            description=f"Author: {tag.author.mention if tag.author else tag.author_id}\nUses: {tag.uses}\nLength: {len(tag)}",
+            description=f"Author: {tag.author.mention if tag.author else tag.author_id}\nUses: {self.get_uses(ctx.guild.id, tag)}\nLength: {len(tag)}",
         )
         e.add_field(name="TagScript", value=box(str(tag)))
+        compiled = self.engine.get_compiled(ctx.guild.id, str(tag))
+        e.add_field(
+            name="Cache",
+            value=(
+                f"Tag hits: {compiled.hits if compiled else 0}\n"
+                f"Total hits: {self.engine.hits}\nTotal misses: {self.engine.misses}"
+            ),
+            inline=False,
+        )
+        e.set_author(name=ctx.guild, icon_url=ctx.guild.icon_url)
+        await ctx.send(embed=e)
+
+    @tag.command(name="stats")
+    async def tag_stats(self, ctx):
+        """View tag usage statistics for this server since the cog was loaded."""
+        usage = self.stats.get_guild(ctx.guild.id)
+        if not usage or not usage.total:
+            return await ctx.send("No tags have been used on this server yet.")
+        current, average, hours = usage.hourly_rate(time.time())
+        e = discord.Embed(color=await ctx.embed_color(), title="Tag Stats")
         e.set_author(name=ctx.guild, icon_url=ctx.guild.icon_url)
+        top = "\n".join(
+            f"{index}. `{name}` - {count} uses"
+            for index, (name, count) in enumerate(usage.uses.most_common(10), start=1)
+        )
+        e.add_field(name="Top Tags", value=top or "None", inline=False)
+        e.add_field(
+            name="Rate",
+            value=f"This hour: {current}\nAverage per hour ({hours}h): {round(average, 2)}",
+        )
+        e.add_field(
+            name="Latency",
+            value=(
+                f"p50: {round(usage.percentile(50), 2)} ms\n"
+                f"p95: {round(usage.percentile(95), 2)} ms"
+            ),
+        )
+        e.add_field(
+            name="End-to-end",
+            value=(
+                f"p50: {round(usage.percentile(50, total=True), 2)} ms\n"
+                f"p95: {round(usage.percentile(95, total=True), 2)} ms"
+            ),
+        )
+        recent = "\n".join(
+            f"`{event.tag}` - <@{event.user_id}> <t:{int(event.timestamp)}:R>"
+            for event in reversed(usage.recent)
+        )
+        e.add_field(name="Recent Uses", value=recent or "None", inline=False)
+        e.set_footer(text=f"{usage.total} uses recorded")
         await ctx.send(embed=e)
 
     @tag.command(name="raw")
@@ -189,36 +412,41 @@ class Tags(commands.Cog):
             allowed_mentions=discord.AllowedMentions(everyone=False, roles=False, users=False),
         )
 
-    @tag.command(name="list")
-    async def tag_list(self, ctx):
-        """View stored tags."""
-        tags = await self.config.guild(ctx.guild).tags()
-        if not tags:
+    @tag.command(name="list", usage="[sort=name] [prefix]")
+    async def tag_list(self, ctx, sort: Optional[TagSort] = "name", prefix: str = None):
+        """View stored tags.
+
+        Tags can be sorted by `name`, `uses` or `author`, and filtered to names starting with a prefix.
+        """
+        tags = self.guild_data_cache.get(ctx.guild.id, {}).get("tags", {})
+        names = [
+            name
+            for name in self.tag_cache.get(ctx.guild.id, ())
+            if name in tags and (not prefix or name.startswith(prefix))
+        ]
+        if not names:
+            if prefix:
+                return await ctx.send(f"There are no stored tags starting with `{prefix}`.")
             return await ctx.send("There are no stored tags on this server.")
-        description = []
 
-        for name, tag in tags.items():
-            description.append(f"`{name}` - Created by <@!{tag['author']}>")
-        description = "\n".join(description)
+        if sort == "uses":
+            pending = self.pending_uses.get(ctx.guild.id, {})
+            names.sort(key=lambda n: (-((tags[n].get("uses") or 0) + pending.get(n, 0)), n))
+        elif sort == "author":
+            names.sort(key=lambda n: (tags[n].get("author") or 0, n))
+        else:
+            names.sort()
 
         color = await self.bot.get_embed_colour(ctx)
         e = discord.Embed(color=color, title=f"Stored Tags")
         e.set_author(name=ctx.guild, icon_url=ctx.guild.icon_url)
+        pages = TagListPages(names, tags, e)
 
-        if len(description) > 2048:
-            embeds = []
-            pages = list(pagify(description, page_length=1024))
-            for index, page in enumerate(pages, start=1):
-                embed = e.copy()
-                embed.description = page
-                embed.set_footer(text=f"{index}/{len(pages)}")
-                embeds.append(embed)
-            await menu(ctx, embeds, DEFAULT_CONTROLS)
+        if len(pages) > 1:
+            await pages.start(ctx)
         else:
-            e.description = description
             emoji = self.bot.get_emoji(736038541364297738) or "❌"
-            controls = {emoji: close_menu}
-            await menu(ctx, [e], controls)
+            await pages.start(ctx, {emoji: close_menu})
 
     @commands.is_owner()
     @commands.mod_or_permissions(manage_guild=True)
@@ -239,15 +467,25 @@ class Tags(commands.Cog):
             "guild": guild,
             "server": guild,
         }
-        output = self.engine.process(tagscript, seed_variables=seed)
+        tag = Tag("executed_tag", tagscript, invoker=ctx.author, author=ctx.author, ctx=ctx)
+        try:
+            output = await self.run_tag(tag, seed_variables=seed)
+        except BudgetExceeded as error:
+            output = None
+            budget = error.budget
+        else:
+            budget = output.budget
         end = time.monotonic()
 
         e = discord.Embed(
             color=await ctx.embed_color(),
             title="TagScriptEngine",
-            description=f"Executed in **{round((end - start) * 1000, 3)}** ms",
+            description=f"Executed in **{round((end - start) * 1000, 3)}** ms\nBudget: {budget}",
         )
         e.add_field(name="Input", value=tagscript, inline=False)
+        if output is None:
+            await ctx.send(embed=e)
+            return
         if output.actions:
             e.add_field(name="Actions", value=output.actions, inline=False)
         if output.variables:
@@ -278,6 +516,9 @@ class Tags(commands.Cog):
     async def store_tag(self, ctx: commands.Context, name: str, tagscript: str):
         async with self.config.guild(ctx.guild).tags() as t:
             t[name] = {"author": ctx.author.id, "uses": 0, "tag": tagscript}
+        self.uncache_tag(ctx.guild.id, name)
+        self.cache_tag(ctx.guild.id, name, {"author": ctx.author.id, "uses": 0, "tag": tagscript})
+        await self.cache_requirements(ctx, tagscript)
         await ctx.send(f"Tag stored under the name `{name}`.")
 
     # thanks trusty, https://github.com/TrustyJAID/Trusty-cogs/blob/master/retrigger/retrigger.py#L1065
@@ -318,7 +559,15 @@ class Tags(commands.Cog):
             or not message.guild
         ):
             return
-        if message.guild.id not in self.tag_cache.keys():
+        await self.dispatch_tag(message)
+
+    async def dispatch_tag(self, message: discord.Message):
+        """Run the tag `message` invokes, if any, on the context built for it.
+
+        This stands in for invoking `[p]tag` through `bot.invoke`: the command's checks, before
+        and after hooks and command events all run, but its arguments aren't parsed again."""
+        tag_names = self.tag_cache.get(message.guild.id)
+        if not tag_names:
             return
         if not await self.bot.message_eligible_as_command(message):
             return
@@ -327,19 +576,42 @@ class Tags(commands.Cog):
             return
 
         tag_command = message.content[len(ctx.prefix) :]
-        tag_split = tag_command.split(" ")
-        if not tag_split:
+        tag_name, _, args = tag_command.partition(" ")
+        if tag_name not in tag_names:
             return
-        tag_name = tag_split[0]
-        if tag_name in self.tag_cache.get(message.guild.id, []):
-            new_message = copy(message)
-            new_message.content = f"{ctx.prefix}tag False {tag_command}"
-            ctx = await self.bot.get_context(new_message)
-            await self.bot.invoke(ctx)
+        data = self.guild_data_cache.get(message.guild.id, {}).get("tags", {}).get(tag_name)
+        if not data:
+            return
+        ctx.command = self.tag
+        ctx.invoked_with = tag_name
+        self.bot.dispatch("command", ctx)
+        try:
+            if not await self.tag.can_run(ctx):
+                raise commands.CheckFailure(
+                    f"The check functions for command {self.tag.qualified_name} failed."
+                )
+            # runs the bot's before invoke hook too, as Command.invoke would
+            await self.tag.call_before_hooks(ctx)
+            try:
+                tag = Tag.from_dict(tag_name, data, ctx=ctx)
+                await self.invoke_tag(ctx, tag, args.strip())
+            finally:
+                await self.tag.call_after_hooks(ctx)
+        except Exception as error:
+            ctx.command_failed = True
+            if not isinstance(error, commands.CommandError):
+                error = commands.CommandInvokeError(error)
+            # the bot's error handler gives the user feedback, like any failed command
+            self.bot.dispatch("command_error", ctx, error)
+        else:
+            self.bot.dispatch("command_completion", ctx)
 
     async def process_tag(
         self, ctx: commands.Context, tag: Tag, *, seed_variables: dict = {}, **kwargs
-    ) -> str:
+    ) -> float:
+        """Run a tag and carry out its actions.
+
+        Returns how long the TagScript itself took to run, in milliseconds."""
         author = MemberAdapter(ctx.author)
         target = MemberAdapter(ctx.message.mentions[0]) if ctx.message.mentions else author
         channel = TextChannelAdapter(ctx.channel)
@@ -356,9 +628,17 @@ class Tags(commands.Cog):
         }
         seed_variables.update(seed)
 
-        output = tag.run(self.engine, seed_variables=seed_variables, **kwargs)
+        start = time.perf_counter()
+        try:
+            output = await self.run_tag(tag, seed_variables=seed_variables, **kwargs)
+        except BudgetExceeded as error:
+            latency = (time.perf_counter() - start) * 1000
+            log.info(f"Tag {tag} on {ctx.guild} ({ctx.guild.id}) exceeded its budget: {error}")
+            await ctx.send(f"This tag exceeded its execution budget. {error}")
+            return latency
+        latency = (time.perf_counter() - start) * 1000
         to_gather = []
-        command_messages = []
+        command_contexts = []
         content = output.body[:2000] if output.body else None
         actions = output.actions
         embed = actions.get("embed")
@@ -371,7 +651,7 @@ class Tags(commands.Cog):
                         await ctx.send(response[:2000])
                     else:
                         start_adding_reactions(ctx.message, ["❌"])
-                    return
+                    return latency
             if delete := actions.get("delete"):
                 if ctx.channel.permissions_for(ctx.me).manage_messages:
                     to_gather.append(delete_quietly(ctx.message))
@@ -381,10 +661,12 @@ class Tags(commands.Cog):
                 for command in actions["commands"]:
                     if command.startswith("tag"):
                         await ctx.send("Looping isn't allowed.")
-                        return
-                    new = copy(ctx.message)
-                    new.content = ctx.prefix + command
-                    command_messages.append(new)
+                        return latency
+                    command_ctx = self.get_command_context(
+                        ctx, command, actions.get("silent", False)
+                    )
+                    if command_ctx.valid:
+                        command_contexts.append(command_ctx)
             if target := actions.get("target"):
                 if target == "dm":
                     destination = await ctx.author.create_dm()
@@ -398,54 +680,191 @@ class Tags(commands.Cog):
                             destination = chan
 
         # this is going to become an asynchronous swamp
+        # start the invoking message's delete/reactions alongside the send
+        to_gather = [asyncio.create_task(coro) for coro in to_gather]
         msg = None
         if content or embed:
             msg = await send_quietly(destination, content, embed=embed)
             if msg and (react := actions.get("react")):
                 to_gather.append(self.do_reactions(ctx, react, msg))
-        if command_messages:
-            silent = actions.get("silent", False)
-            to_gather.append(
-                asyncio.gather(
-                    *[self.process_command(message, silent) for message in command_messages]
-                )
-            )
+        if command_contexts:
+            sequential = actions.get("sequential", False)
+            to_gather.append(self.process_commands(command_contexts, sequential=sequential))
 
         if to_gather:
             await asyncio.gather(*to_gather)
+        return latency
+
+    async def process_tagscript(
+        self, tagscript: str, seed_variables: dict = None
+    ) -> Interpreter.Response:
+        """Process TagScript with the shared Tags engine.
+
+        This is the entry point for other cogs, looked up with `bot.get_cog("Tags")`. Runs are
+        cached and budgeted like tags are; if the budget is exceeded, the returned response has
+        no body and `response.budget.exceeded` says why."""
+        tag = Tag("expression", tagscript)
+        compiled = self.engine.compile_expression(tagscript)
+        try:
+            return await self.run_tag(tag, seed_variables=seed_variables, compiled=compiled)
+        except BudgetExceeded as error:
+            return BudgetedResponse(error.budget)
 
-    async def process_command(self, command_message: discord.Message, silent: bool = False):
-        ctx = await self.bot.get_context(
-            command_message, cls=SilentContext if silent is True else commands.Context
+    async def run_tag(self, tag: Tag, **kwargs) -> Interpreter.Response:
+        budget = ExecutionBudget(
+            max_steps=TAG_MAX_STEPS, max_chars=TAG_MAX_CHARS, timeout=TAG_TIMEOUT
         )
-        if ctx.valid:
-            await self.bot.invoke(ctx)
+        task = functools.partial(tag.run, self.engine, budget=budget, **kwargs)
+        compiled = kwargs.get("compiled")
+        # every block starts with a brace, so that bounds the nodes of an uncompiled tag
+        nodes = len(compiled.coordinates) if compiled else tag.tagscript.count("{")
+        if len(tag) < OFFLOAD_LENGTH and nodes < OFFLOAD_NODES:
+            return task()
+        future = self.bot.loop.run_in_executor(self.executor, task)
+        try:
+            # a single block can't be interrupted, so this is a last resort
+            return await asyncio.wait_for(future, timeout=TAG_TIMEOUT + 1)
+        except asyncio.TimeoutError:
+            budget.exceeded = f"Time limit reached ({TAG_TIMEOUT:g}s)."
+            raise BudgetExceeded(budget, budget.exceeded)
+
+    def get_command_context(
+        self, ctx: commands.Context, command: str, silent: bool = False
+    ) -> commands.Context:
+        """Build the context for a tag command from the tag's own context.
+
+        The prefix is already known, so only the command name needs to be parsed."""
+        message = copy(ctx.message)
+        message.content = ctx.prefix + command
+        view = StringView(command)
+        invoker = view.get_word()
+        cls = SilentContext if silent is True else commands.Context
+        new_ctx = cls(prefix=ctx.prefix, view=view, bot=self.bot, message=message)
+        new_ctx.invoked_with = invoker
+        new_ctx.command = self.bot.all_commands.get(invoker)
+        return new_ctx
+
+    async def process_commands(
+        self, contexts: List[commands.Context], *, sequential: bool = False
+    ):
+        if sequential:
+            for ctx in contexts:
+                await self.invoke_command(ctx)
+        else:
+            await asyncio.gather(*[self.invoke_command(ctx) for ctx in contexts])
+
+    async def invoke_command(self, ctx: commands.Context):
+        # commands can wait on user input for minutes, so a busy guild can only take its own
+        # share of the bot-wide slots, and queued commands give up instead of piling up
+        with self.guild_command_semaphores.use(ctx.guild.id) as guild_semaphore:
+            try:
+                await asyncio.wait_for(
+                    self.acquire_command_slot(guild_semaphore), timeout=COMMAND_ACQUIRE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                log.info(f"Dropped tag command {ctx.invoked_with} on {ctx.guild} ({ctx.guild.id})")
+                return
+            try:
+                await self.bot.invoke(ctx)
+            finally:
+                self.command_semaphore.release()
+                guild_semaphore.release()
+
+    async def acquire_command_slot(self, guild_semaphore: asyncio.Semaphore):
+        # the guild's slot is taken first, so a guild's backlog never holds bot-wide slots
+        await guild_semaphore.acquire()
+        try:
+            await self.command_semaphore.acquire()
+        except BaseException:
+            guild_semaphore.release()
+            raise
 
     async def validate_checks(self, ctx: commands.Context, actions: dict) -> Tuple[bool, str]:
-        role_ids = [r.id for r in ctx.author.roles]
+        role_ids = {r.id for r in ctx.author.roles}
         channel_id = ctx.channel.id
         if requires := actions.get("requires"):
             for argument in requires["items"]:
-                role_or_channel = await self.role_or_channel_convert(ctx, argument)
-                if role_or_channel:
-                    if isinstance(role_or_channel, discord.Role):
-                        if role_or_channel.id not in role_ids:
+                requirement = await self.resolve_requirement(ctx, argument)
+                if requirement:
+                    is_role, object_id = requirement
+                    if is_role:
+                        if object_id not in role_ids:
                             return False, requires["response"]
                     else:
-                        if role_or_channel.id != channel_id:
+                        if object_id != channel_id:
                             return False, requires["response"]
         if blacklist := actions.get("blacklist"):
             for argument in blacklist["items"]:
-                role_or_channel = await self.role_or_channel_convert(ctx, argument)
-                if role_or_channel:
-                    if isinstance(role_or_channel, discord.Role):
-                        if role_or_channel.id in role_ids:
+                requirement = await self.resolve_requirement(ctx, argument)
+                if requirement:
+                    is_role, object_id = requirement
+                    if is_role:
+                        if object_id in role_ids:
                             return False, blacklist["response"]
                     else:
-                        if role_or_channel.id == channel_id:
+                        if object_id == channel_id:
                             return False, blacklist["response"]
         return True, ""
 
+    async def resolve_requirement(
+        self, ctx: commands.Context, argument: str
+    ) -> Optional[Tuple[bool, int]]:
+        """Resolve a require/blacklist item to `(is_role, id)`, caching the result per guild."""
+        guild_cache = self.requirement_cache.setdefault(ctx.guild.id, OrderedDict())
+        try:
+            requirement = guild_cache[argument]
+        except KeyError:
+            pass
+        else:
+            guild_cache.move_to_end(argument)
+            return requirement
+        role_or_channel = await self.role_or_channel_convert(ctx, argument)
+        if role_or_channel:
+            requirement = (isinstance(role_or_channel, discord.Role), role_or_channel.id)
+        else:
+            requirement = None
+        guild_cache[argument] = requirement
+        if len(guild_cache) > REQUIREMENT_CACHE_SIZE:
+            guild_cache.popitem(last=False)
+        return requirement
+
+    async def cache_requirements(self, ctx: commands.Context, tagscript: str):
+        """Resolve the static require/blacklist items of a tag ahead of its first use."""
+        for match in REQUIREMENT_RE.finditer(tagscript):
+            for argument in match.group(1).split(","):
+                await self.resolve_requirement(ctx, argument)
+
+    def clear_requirement_cache(self, guild: discord.Guild):
+        self.requirement_cache.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        self.clear_requirement_cache(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.clear_requirement_cache(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name:
+            self.clear_requirement_cache(after.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        self.clear_requirement_cache(channel.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.clear_requirement_cache(channel.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ):
+        if before.name != after.name:
+            self.clear_requirement_cache(after.guild)
+
     async def role_or_channel_convert(self, ctx: commands.Context, argument: str):
         objects = await asyncio.gather(
             self.role_converter.convert(ctx, argument),
@@ -455,27 +874,56 @@ class Tags(commands.Cog):
         objects = [obj for obj in objects if isinstance(obj, (discord.Role, discord.TextChannel))]
         return objects[0] if objects else None
 
+    def get_emoji_map(self, guild: discord.Guild) -> Dict[str, Union[discord.Emoji, str]]:
+        emojis = self.emoji_cache.get(guild.id)
+        if emojis is None:
+            emojis = {}
+            for emoji in guild.emojis:
+                emojis.setdefault(emoji.name, emoji)
+                emojis[str(emoji.id)] = emoji
+                emojis[str(emoji)] = emoji
+            self.emoji_cache[guild.id] = emojis
+        return emojis
+
+    def resolve_emojis(self, guild: discord.Guild, arguments: List[str]) -> list:
+        emojis = self.get_emoji_map(guild)
+        resolved = []
+        for argument in arguments:
+            emoji = emojis.get(argument)
+            if emoji is None:
+                if match := EMOJI_RE.match(argument):
+                    emoji = self.bot.get_emoji(int(match.group(1)))
+                elif EMOJI_ID_RE.match(argument):
+                    # a bare ID, checked before names since IDs look like names too
+                    emoji = self.bot.get_emoji(int(argument))
+                elif EMOJI_NAME_RE.match(argument):
+                    emoji = discord.utils.get(self.bot.emojis, name=argument)
+                if emoji is None:
+                    # unicode emoji and unknown names resolve to themselves, remember that
+                    emoji = argument
+                    if len(emojis) < EMOJI_CACHE_SIZE:
+                        emojis[argument] = argument
+            resolved.append(emoji)
+        return resolved
+
+    async def add_reactions(self, message: discord.Message, emojis: list):
+        # reactions share a per-channel bucket, so don't let tags race each other for it
+        with self.reaction_locks.use(message.channel.id) as lock:
+            async with lock:
+                for emoji in emojis:
+                    try:
+                        await message.add_reaction(emoji)
+                    except discord.HTTPException:
+                        pass
+
     async def do_reactu(self, ctx: commands.Context, reactu: list):
         if reactu:
-            for arg in reactu:
-                try:
-                    arg = await self.emoji_converter.convert(ctx, arg)
-                except commands.BadArgument:
-                    pass
-                try:
-                    await ctx.message.add_reaction(arg)
-                except discord.HTTPException:
-                    pass
+            await self.add_reactions(ctx.message, self.resolve_emojis(ctx.guild, reactu))
 
     async def do_reactions(self, ctx: commands.Context, react: list, msg: discord.Message):
         if msg and react:
-            for arg in react:
-                print(arg)
-                try:
-                    arg = await self.emoji_converter.convert(ctx, arg)
-                except commands.BadArgument:
-                    pass
-                try:
-                    await msg.add_reaction(arg)
-                except discord.HTTPException:
-                    pass
+            await self.add_reactions(msg, self.resolve_emojis(ctx.guild, react))
+
+    @commands.Cog.listener()
+    async def on_guild_emojis_update(self, guild: discord.Guild, before: list, after: list):
+        self.emoji_cache.pop(guild.id, None)